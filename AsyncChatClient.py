@@ -0,0 +1,85 @@
+import time
+import asyncio
+import inspect
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is only needed for the asyncio backend
+    aiohttp = None
+
+class ChatCompletionError(Exception):
+
+    def __init__(self, http_status, message, headers=None):
+        super().__init__(f"HTTP {http_status}: {message}")
+        self.http_status = http_status
+        self.headers = headers or {}
+
+class AsyncChatClient:
+
+    # Constants
+    CONCURRENCY = 64
+    CONNECT_TIMEOUT = 10  # seconds
+    REQUEST_TIMEOUT = 120  # seconds
+
+    # on_request(seconds, usage) is called for every answered HTTP request (retried attempts included)
+    def __init__(self, api_key, api_base, model, scheduler, concurrency=None, request_timeout=None, connect_timeout=None, on_request=None):
+        if aiohttp is None:
+            raise ImportError(f"{inspect.currentframe().f_code.co_name}: The asyncio backend requires aiohttp (pip install aiohttp).")
+
+        self.api_key = api_key
+        self.url = f"{api_base.rstrip('/')}/chat/completions"
+        self.model = model
+        self.scheduler = scheduler
+        self.concurrency = concurrency or AsyncChatClient.CONCURRENCY
+        self.request_timeout = request_timeout or AsyncChatClient.REQUEST_TIMEOUT
+        self.connect_timeout = connect_timeout or AsyncChatClient.CONNECT_TIMEOUT
+        self.on_request = on_request
+
+    # Run every job of (key, messages, cost) over one pooled keep-alive session
+    # on_response(key, content) / on_error(key, error) are called on the event loop as each job finishes, so they must not block
+    def get_responses(self, jobs, on_response, on_error):
+        return asyncio.run(self._get_responses(jobs, on_response, on_error))
+
+    # Private methods
+
+    async def _get_responses(self, jobs, on_response, on_error):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout, connect=self.connect_timeout)
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            await asyncio.gather(*[self._run_job(session, semaphore, job, on_response, on_error) for job in jobs])
+
+    async def _run_job(self, session, semaphore, job, on_response, on_error):
+        key, messages, cost = job
+        try:
+            content = await self._call(session, semaphore, messages, cost)
+        except Exception as e:
+            on_error(key, e)
+            return
+        on_response(key, content)
+
+    # Same rate limits and retry policy as the thread backend
+    async def _call(self, session, semaphore, messages, cost):
+        for attempt in range(self.scheduler.max_retries + 1):
+            delay = self.scheduler.get_acquire_delay(cost)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                async with semaphore:
+                    return await self._request(session, messages)
+            except Exception as e:
+                if attempt >= self.scheduler.max_retries or not self.scheduler.is_retryable(e):
+                    raise
+                await asyncio.sleep(self.scheduler.get_retry_delay(e, attempt))
+
+    async def _request(self, session, messages):
+        started = time.perf_counter()
+        async with session.post(self.url, json={"model": self.model, "messages": messages}) as response:
+            if response.status != 200:
+                raise ChatCompletionError(response.status, await response.text(), dict(response.headers))
+            data = await response.json()
+        if self.on_request:
+            self.on_request(time.perf_counter() - started, data.get("usage") or {})
+        return data["choices"][0]["message"]["content"].strip()
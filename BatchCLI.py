@@ -0,0 +1,141 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+import SystemMessages
+from GPTHandler import GPTHandler
+from ExcelFileAnalyzer import ExcelFileAnalyzer
+from WorkbookWriter import WorkbookWriter
+
+# Stands in for the GUI: answers the file requests with a fixed workbook and reports errors on stderr
+class HeadlessObserver:
+
+    def __init__(self, excel_file):
+        self.excel_file = excel_file
+        self.errors = []
+
+    def update(self, event, **kwargs):
+        if event == "request_excel_file":
+            return self.excel_file
+        if event == "show_error":
+            self.errors.append(kwargs.get("message"))
+            print(f"{os.path.basename(self.excel_file)}: {kwargs.get('message')}", file=sys.stderr)
+        return None
+
+class BatchCLI:
+
+    # Constants
+    FILE_PATTERNS = ("*.xlsx", "*.xls")
+    FILES_IN_PARALLEL = 4
+
+    # Expand globs and directories into a sorted list of workbooks (Excel's "~$" lock files are skipped)
+    @staticmethod
+    def find_workbooks(paths, recursive=False):
+        excel_files = set()
+        for path in paths:
+            if os.path.isdir(path):
+                for pattern in BatchCLI.FILE_PATTERNS:
+                    excel_files.update(glob.glob(os.path.join(path, "**", pattern) if recursive else os.path.join(path, pattern), recursive=recursive))
+            else:
+                matches = glob.glob(path, recursive=recursive)
+                if not matches:
+                    print(f"{inspect.currentframe().f_code.co_name}: No workbooks match '{path}'", file=sys.stderr)
+                excel_files.update(matches)
+        return sorted(excel_file for excel_file in excel_files if not os.path.basename(excel_file).startswith("~$"))
+
+    # Classify one workbook on the calling thread; returns a summary dict
+    @staticmethod
+    def run_workbook(excel_file, args):
+        started = time.monotonic()
+        observer = HeadlessObserver(excel_file)
+        analyzer = ExcelFileAnalyzer()
+        analyzer.attach(observer)
+        analyzer.near_duplicate_threshold = args.near_duplicate_threshold
+        analyzer.local_classifier_threshold = args.local_threshold
+        analyzer.output_formats = tuple(args.output_format)
+
+        try:
+            columns = ExcelFileAnalyzer.get_needed_columns(args.target_column, args.prompt, args.standard_column) if args.only_needed_columns else None
+            analyzer.open_excel_file(columns=columns, streaming=args.streaming)
+            if analyzer.df is None:
+                raise ValueError("The workbook could not be read.")
+            missing_columns = [column for column in (ExcelFileAnalyzer.INDEX, args.target_column) if column not in analyzer.df.columns]
+            if missing_columns:
+                raise ValueError(f"Columns {missing_columns} not found.")
+
+            analyzer.message_resolver(args.target_column, args.prompt, args.new_column, standard_column=args.standard_column, wait=True)
+        except Exception as e:
+            observer.errors.append(str(e))
+            print(f"{inspect.currentframe().f_code.co_name}: {excel_file} failed: {e}", file=sys.stderr)
+        finally:
+            # Deliver the events the run posted (errors among them)
+            analyzer.drain()
+            analyzer.close()
+
+        # Unresolved rows are reported as an error event as well; a partial result is never a success
+        rows = len(analyzer.checkpoint.get_values()) if analyzer.checkpoint else 0
+        return {"file": excel_file, "ok": not observer.errors and not analyzer.unresolved_rows, "errors": observer.errors, "rows": rows,
+                "unresolved_rows": analyzer.unresolved_rows, "seconds": time.monotonic() - started}
+
+    @staticmethod
+    def get_parser():
+        parser = argparse.ArgumentParser(description="Run a GPT classification over many workbooks without the GUI.")
+        parser.add_argument("paths", nargs="+", help="workbooks, glob patterns or directories")
+        parser.add_argument("--prompt", required=True, choices=list(SystemMessages.ALL_MESSAGES), help="system message to use")
+        parser.add_argument("--target-column", default="opinion", help="column whose texts are classified")
+        parser.add_argument("--standard-column", default=None, help="column the evaluation and summarization prompts compare against")
+        parser.add_argument("--new-column", default="summary", help="name of the column that receives the answers")
+        parser.add_argument("--recursive", action="store_true", help="also search the subdirectories of the given directories")
+        parser.add_argument("--files-in-parallel", type=int, default=BatchCLI.FILES_IN_PARALLEL, help="workbooks processed at the same time")
+        parser.add_argument("--max-workers", type=int, default=None, help="requests in flight across all workbooks (thread backend)")
+        parser.add_argument("--requests-per-minute", type=int, default=None)
+        parser.add_argument("--tokens-per-minute", type=int, default=None)
+        parser.add_argument("--backend", choices=GPTHandler.BACKENDS, default=GPTHandler.backend)
+        parser.add_argument("--near-duplicate-threshold", type=float, default=None, help="e.g. 0.85 to also collapse near-identical texts (lower values merge answers with different meanings)")
+        parser.add_argument("--local-threshold", type=float, default=None,
+                            help="e.g. 0.9 to let a local model trained on cached answers label the rows it is confident about")
+        parser.add_argument("--streaming", action="store_true", help="read the workbooks with openpyxl's read-only row iterator")
+        parser.add_argument("--only-needed-columns", action="store_true",
+                            help="read only the index, target and standard columns (faster on wide sheets; the Combined output then holds only these)")
+        parser.add_argument("--output-format", nargs="+", choices=WorkbookWriter.FORMATS, default=["xlsx"],
+                            help="formats of the Combined/Extra outputs, e.g. --output-format xlsx parquet")
+        return parser
+
+    @staticmethod
+    def main(argv=None):
+        args = BatchCLI.get_parser().parse_args(argv)
+
+        excel_files = BatchCLI.find_workbooks(args.paths, args.recursive)
+        if not excel_files:
+            print(f"{inspect.currentframe().f_code.co_name}: No workbooks found.", file=sys.stderr)
+            return 1
+
+        # The outputs are named after the input file, so two inputs with the same name would overwrite each other
+        file_names = [os.path.basename(excel_file) for excel_file in excel_files]
+        duplicated = sorted({file_name for file_name in file_names if file_names.count(file_name) > 1})
+        if duplicated:
+            print(f"{inspect.currentframe().f_code.co_name}: Workbooks with the same name would overwrite each other's outputs: {duplicated}", file=sys.stderr)
+            return 1
+
+        # One scheduler and one response cache are shared by every workbook, so the API limits bound the whole batch
+        GPTHandler.configure_scheduler(args.max_workers, args.requests_per_minute, args.tokens_per_minute)
+        GPTHandler.configure_backend(args.backend)
+
+        print(f"Processing {len(excel_files)} workbooks ({args.files_in_parallel} at a time)")
+        with ThreadPoolExecutor(max_workers=max(1, args.files_in_parallel), thread_name_prefix="workbook") as executor:
+            summaries = list(executor.map(lambda excel_file: BatchCLI.run_workbook(excel_file, args), excel_files))
+
+        for summary in summaries:
+            status = "ok" if summary["ok"] else f"failed ({'; '.join(summary['errors'])})"
+            print(f"{summary['file']}: {status}, {summary['rows']} rows classified, {summary['unresolved_rows']} unresolved, {summary['seconds']:.1f}s")
+
+        GPTHandler.get_scheduler().shutdown()
+        failed = sum(not summary["ok"] for summary in summaries)
+        print(f"{len(summaries) - failed}/{len(summaries)} workbooks done, {GPTHandler.get_scheduler().retries} retries")
+        return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(BatchCLI.main())
@@ -0,0 +1,58 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+class ClusteringEngine:
+
+    # Constants
+    SEED = 42
+    MINI_BATCH_THRESHOLD = 20000  # rows from which MiniBatchKMeans is used instead of KMeans
+    MINI_BATCH_SIZE = 4096
+    N_INIT = 10
+    MINI_BATCH_N_INIT = 3
+    MIN_DF = 2  # tokens seen in a single row only do not help clustering and bloat the vocabulary
+
+    def __init__(self, max_features=None, min_df=None, mini_batch_threshold=None, random_state=None):
+        self.max_features = max_features
+        self.min_df = ClusteringEngine.MIN_DF if min_df is None else min_df
+        self.mini_batch_threshold = mini_batch_threshold or ClusteringEngine.MINI_BATCH_THRESHOLD
+        self.random_state = ClusteringEngine.SEED if random_state is None else random_state
+        self.vectorizer = None
+        self.matrix = None
+        self.index = None
+
+    # Fit the vocabulary once on the already tokenized texts (tokens separated by spaces, e.g. the shared
+    # tokenized_<column> column) and keep the sparse TF-IDF matrix; rows are addressed by the Series' index
+    def fit(self, tokenized_texts):
+        self.vectorizer = TfidfVectorizer(analyzer=str.split, lowercase=False, min_df=self.min_df, max_features=self.max_features,
+                                          dtype=np.float32)
+        try:
+            self.matrix = self.vectorizer.fit_transform(tokenized_texts.astype(str)).tocsr()
+        except ValueError:
+            # Every token occurs only once (e.g. tiny inputs): keep them all
+            self.vectorizer.set_params(min_df=1)
+            self.matrix = self.vectorizer.fit_transform(tokenized_texts.astype(str)).tocsr()
+        self.index = tokenized_texts.index
+        return self
+
+    # Sparse features of the rows in lengths.index: their TF-IDF rows plus the text length scaled to [0, 1]
+    # within those rows (as MinMaxScaler did), without densifying anything
+    def get_features(self, lengths, length_weight=1.0):
+        positions = self.index.get_indexer(lengths.index)
+        if (positions < 0).any():
+            raise ValueError("get_features: Some rows were not part of the fitted texts.")
+
+        lengths = lengths.to_numpy(dtype=np.float32)
+        span = lengths.max() - lengths.min() if len(lengths) else 0
+        normalized = (lengths - lengths.min()) / span if span else np.zeros_like(lengths)
+        return sp.hstack([self.matrix[positions], sp.csr_matrix(normalized.reshape(-1, 1) * length_weight)], format='csr')
+
+    # Cluster labels of the feature rows; MiniBatchKMeans for large inputs
+    def cluster(self, features, n_clusters=2):
+        if features.shape[0] >= self.mini_batch_threshold:
+            model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=ClusteringEngine.MINI_BATCH_SIZE,
+                                    n_init=ClusteringEngine.MINI_BATCH_N_INIT, random_state=self.random_state)
+        else:
+            model = KMeans(n_clusters=n_clusters, n_init=ClusteringEngine.N_INIT, random_state=self.random_state)
+        return model.fit_predict(features)
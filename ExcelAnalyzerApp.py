@@ -1,3 +1,4 @@
+import threading
 import tkinter
 import tkinter.ttk
 import SystemMessages
@@ -76,6 +77,10 @@ class ExcelAnalyzerApp:
         self.save_label = tkinter.Label(frame, text="Not saved yet", wraplength=350)
         self.save_label.pack()
 
+        self.flush_partial_results_button = tkinter.Button(frame, text="Save Partial Results", command=lambda: threading.Thread(
+            target=self.excel_file_analyzer.flush_partial_results, daemon=True).start())
+        self.flush_partial_results_button.pack()
+
         self.clear_classification_button = tkinter.Button(frame, text="Clear", command=lambda: self.excel_file_analyzer.clear_classify())
         self.clear_classification_button.pack()
 
@@ -122,6 +127,7 @@ class ExcelAnalyzerApp:
 
             
     def run(self):
+        self._update_progress_label()
         self.update_periodically()
         self.app.mainloop()
     
@@ -146,15 +152,11 @@ class ExcelAnalyzerApp:
         }
         return update_mapping.get(event, lambda **kwargs: None)(**kwargs)
     
+    # Deliver the events posted by the worker threads in one batch on the UI thread
+    # (workers never call into Tk); the progress label is only redrawn when an event arrived
     def update_periodically(self):
-        if self.processed_chunks == self.num_chunks == 0:
-            self._set_label_text(self.gpt_classification_label, f"Waiting for the chunks to be processed...")
-        elif self.num_chunks > 0 and self.processed_chunks == 0:
-            self._set_label_text(self.gpt_classification_label, f"Sending {self.num_chunks} chunks to GPT-3.5 Turbo...")
-        elif self.processed_chunks > 0:
-            self._set_label_text(self.gpt_classification_label, f"Finished {self.processed_chunks} chunks out of {self.num_chunks} chunks")
-        elif self.processed_chunks == self.num_chunks:
-            self._set_label_text(self.gpt_classification_label, f"Completed the classification!")
+        if self.excel_file_analyzer.drain():
+            self._update_progress_label()
 
         # Periodic update (100ms)
         self.app.after(100, self.update_periodically)
@@ -172,6 +174,16 @@ class ExcelAnalyzerApp:
     def _update_files(self, title, **kwargs):
         return filedialog.askopenfilenames(title=title, filetypes=self.FILE_TYPES)
 
+    def _update_progress_label(self):
+        if self.processed_chunks == self.num_chunks == 0:
+            self._set_label_text(self.gpt_classification_label, f"Waiting for the chunks to be processed...")
+        elif self.num_chunks > 0 and self.processed_chunks == 0:
+            self._set_label_text(self.gpt_classification_label, f"Sending {self.num_chunks} chunks to GPT-3.5 Turbo...")
+        elif self.processed_chunks > 0:
+            self._set_label_text(self.gpt_classification_label, f"Finished {self.processed_chunks} chunks out of {self.num_chunks} chunks")
+        elif self.processed_chunks == self.num_chunks:
+            self._set_label_text(self.gpt_classification_label, f"Completed the classification!")
+
     def _set_label_text(self, label, text):
         label.configure(text=text)
 
@@ -1,5 +1,6 @@
 import os
 import re
+import time
 import threading
 import pandas as pd
 import inspect
@@ -9,13 +10,24 @@ from datetime import datetime
 from inspect import currentframe, getframeinfo
 from GPTHandler import GPTHandler
 from Observable import Observable
-from konlpy.tag import Okt
+from WorkbookLoader import WorkbookLoader
+from WorkbookWriter import WorkbookWriter
+from RunCheckpoint import RunCheckpoint
+from TextDeduplicator import TextDeduplicator
+from MorphAnalyzer import MorphAnalyzer
+from Metrics import Metrics
 
 class ExcelFileAnalyzer(Observable):
 
     # Constants
     SEED = 42
     INDEX = 'no'
+    # Column each prompt compares against when no standard column is given
+    DEFAULT_STANDARD_COLUMNS = {"evaluate category": "category", "evaluate as others": "category", "summarize opinion": "category",
+                                "summarize eval": "eval_category"}
+    # Log files shared by the analyzers of one process: path -> [handler, analyzers using it]
+    _file_handlers = {}
+    _file_handlers_lock = threading.Lock()
         
     def __init__(self):
         super().__init__()
@@ -26,7 +38,14 @@ class ExcelFileAnalyzer(Observable):
         self.target_column = None
         self.standard_column = None
         self.excel_files = [None, None]
-        self.okt = Okt()
+        self.checkpoint = None
+        self.unresolved_rows = 0  # rows the last run could not classify (failed chunks, unrepaired answers)
+        self.metrics = Metrics()  # stage timings, counters and values of the current run
+        self.near_duplicate_threshold = None  # e.g. TextDeduplicator.THRESHOLD (0.85) to also send one representative per cluster of near-identical texts
+        self.duplicate_sources = {}
+        self.local_classifier_threshold = None  # e.g. 0.9 to let a local model trained on cached answers label the rows it is sure about
+        self.output_formats = ('xlsx',)  # formats of the combined/extra files: any of WorkbookWriter.FORMATS
+        self.morph_analyzer = None  # created on first use; konlpy's tokenizer boots a JVM
         self.logger = None
         self.file_handler = None
         self.now = datetime.now()
@@ -38,33 +57,61 @@ class ExcelFileAnalyzer(Observable):
         if(filename is None):
             filename = f"{self.now.strftime('%Y%m%d-%H_%M_%S')}_log.txt"
 
-        # Initialize self.logger if it doesn't exist
+        # Each analyzer logs through its own logger, so concurrent runs don't write into each other's files
         if not hasattr(self, 'logger') or self.logger is None:
-            self.logger = logging.getLogger()
+            self.logger = logging.getLogger(f"{__name__}.{id(self)}")
             self.logger.setLevel(logging.CRITICAL)
+            self.logger.propagate = False
 
         # Check if there's already an existing file handler and remove it
-        if hasattr(self, 'file_handler') and self.file_handler:
-            self.logger.removeHandler(self.file_handler)
-            self.file_handler.close()
-        
-        self.file_handler = logging.FileHandler(filename=filename, mode='w')
-        self.file_handler.setLevel(logging.CRITICAL)
-        formatter = logging.Formatter('%(asctime)s - %(message)s')
-        self.file_handler.setFormatter(formatter)
-        
+        self.close()
+
+        # Analyzers created in the same second (e.g. by the batch CLI) share one handler instead of truncating the file
+        filename = os.path.abspath(filename)
+        with ExcelFileAnalyzer._file_handlers_lock:
+            entry = ExcelFileAnalyzer._file_handlers.get(filename)
+            if entry is None:
+                handler = logging.FileHandler(filename=filename, mode='w')
+                handler.setLevel(logging.CRITICAL)
+                handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+                entry = ExcelFileAnalyzer._file_handlers[filename] = [handler, 0]
+            entry[1] += 1
+            self.file_handler = entry[0]
+
         self.logger.addHandler(self.file_handler)
 
+    def close(self):
+        if not self.file_handler:
+            return
+
+        self.logger.removeHandler(self.file_handler)
+        # The file is closed once the last analyzer sharing it lets go
+        with ExcelFileAnalyzer._file_handlers_lock:
+            entry = ExcelFileAnalyzer._file_handlers.get(self.file_handler.baseFilename)
+            if entry is not None and entry[0] is self.file_handler:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del ExcelFileAnalyzer._file_handlers[self.file_handler.baseFilename]
+                    self.file_handler.close()
+        self.file_handler = None
+
+    def get_morph_analyzer(self):
+        if self.morph_analyzer is None:
+            self.morph_analyzer = MorphAnalyzer()
+        return self.morph_analyzer
+
     def _change_log_context(self, context):
-        logging.critical(f"Program context changed to {context}")
+        self.logger.critical(f"Program context changed to {context}")
 
     # Decorators
     def log_function_call(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # print(f"Calling function {func.__name__} with args={args} and kwargs={kwargs}")
-            print(f"Calling function {func.__name__}...")
-            return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Metrics.record_call(func.__name__, time.perf_counter() - started)
         return wrapper
     
     # Helper methods
@@ -83,14 +130,18 @@ class ExcelFileAnalyzer(Observable):
         return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
 
     # Open the excel file
+    # columns: only keep these columns (e.g. [INDEX, target, standard]); None keeps the whole sheet
+    # streaming: read rows through openpyxl's read-only iterator and build the frame in batches
     @log_function_call
-    def open_excel_file(self):
+    def open_excel_file(self, columns=None, streaming=False):
         excel_file = self.notify("request_excel_file")
         # Read the excel file
         if excel_file:
             try:
-                self.df_original = pd.read_excel(excel_file, engine='openpyxl')
-                self.df = self.df_original.copy()
+                with self.metrics.span("load"):
+                    self.df_original = WorkbookLoader.read_excel(excel_file, columns=columns, streaming=streaming)
+                # A shallow copy is enough: the classification only adds columns to self.df
+                self.df = self.df_original.copy(deep=False)
                 self.filepath = excel_file
                 self.file_name = os.path.basename(excel_file)
                 self._change_log_context(f"open_excel_file({self.file_name})")
@@ -99,7 +150,7 @@ class ExcelFileAnalyzer(Observable):
                 self.notify("show_error", message=f"File '{excel_file}' not found.")
             except Exception as e:
                 frameinfo = getframeinfo(currentframe()) # debugging
-                self._call_notify_and_logging_error(self, inspect.currentframe().f_code.co_name, frameinfo.lineno,)
+                self._call_notify_and_logging_error(inspect.currentframe().f_code.co_name, frameinfo.lineno, e)
 
         # Set the column names
         if self._is_df_empty(self.df):
@@ -122,10 +173,24 @@ class ExcelFileAnalyzer(Observable):
         self.notify("update_gpt_classification_label", message="Not processed yet")
         self.notify("update_save_label", message="Not saved yet")
         self.notify("set_column_names", column_names=[])
-        self.notify("set_num_chunks", num_chunks=0)
-        self.notify("set_processed_chunks", processed_chunks=0)
+        self.post("set_num_chunks", num_chunks=0)
+        self.post("set_processed_chunks", processed_chunks=0)
         GPTHandler.clear()
 
+    # Write the rows finished so far by the current (or last interrupted) run next to the original rows
+    @log_function_call
+    def flush_partial_results(self):
+        if self.checkpoint is None or self._is_df_empty(self.df_original):
+            self.post("show_error", coalesce=False, message="No classification is running.")
+            return
+
+        new_column_name = self.checkpoint.manifest["new_column_name"]
+        partial_df = self.df_original.copy(deep=False)
+        partial_df[new_column_name] = partial_df[ExcelFileAnalyzer.INDEX].map(self.checkpoint.get_values())
+
+        partial_file_name = WorkbookWriter.write_frame(partial_df, f"Partial({self.file_name}).xlsx")
+        self.post("update_save_label", message=f"Saved partial results to {partial_file_name}")
+
     @log_function_call
     def clear_combine(self):
         self.excel_files = [None, None]
@@ -133,8 +198,10 @@ class ExcelFileAnalyzer(Observable):
         self.notify("update_combine_1_excel_label", file_name="No file")
 
     # TODO: According to the system message, classify the content
+    # standard_column: overrides the hard-coded column the evaluation and summarization prompts compare against
+    # wait: run the classification on the calling thread and return when it is done (headless callers)
     @log_function_call
-    def message_resolver(self, target_column, gpt_message, new_column_name='none'):
+    def message_resolver(self, target_column, gpt_message, new_column_name='none', standard_column=None, wait=False):
         if target_column is None or len(target_column) == 0:
             self.notify("show_error", message="No target column selected.")
             return
@@ -143,23 +210,31 @@ class ExcelFileAnalyzer(Observable):
                         
         # TODO: Remove hard-coded values
         if gpt_message == "create category (of 4 types)":
-            self._start_threaded_run_gpt_classification(gpt_message, new_column_name)
+            self._start_threaded_run_gpt_classification(gpt_message, new_column_name, wait)
 
         elif gpt_message == "evaluate category":
-            self.standard_column = "category" # TODO: Remove hard-coded values
-            self._start_threaded_run_gpt_classification(gpt_message, new_column_name)
+            self.standard_column = standard_column or ExcelFileAnalyzer.DEFAULT_STANDARD_COLUMNS[gpt_message]
+            self._start_threaded_run_gpt_classification(gpt_message, new_column_name, wait)
 
         elif gpt_message == "evaluate as others":
-            self.standard_column = "category"
-            self._start_threaded_run_gpt_classification(gpt_message, new_column_name)
+            self.standard_column = standard_column or ExcelFileAnalyzer.DEFAULT_STANDARD_COLUMNS[gpt_message]
+            self._start_threaded_run_gpt_classification(gpt_message, new_column_name, wait)
 
         elif gpt_message == "summarize opinion":
-            self.standard_column = "category" # TODO: Remove hard-coded values
-            self._start_summarization(gpt_message, standard="의견", new_column_name=new_column_name)
+            self.standard_column = standard_column or ExcelFileAnalyzer.DEFAULT_STANDARD_COLUMNS[gpt_message]
+            self._start_summarization(gpt_message, standard="의견", new_column_name=new_column_name, wait=wait)
 
         elif gpt_message == "summarize eval":
-            self.standard_column = "eval_category"
-            self._start_summarization(gpt_message, standard="의견", new_column_name=new_column_name)
+            self.standard_column = standard_column or ExcelFileAnalyzer.DEFAULT_STANDARD_COLUMNS[gpt_message]
+            self._start_summarization(gpt_message, standard="의견", new_column_name=new_column_name, wait=wait)
+
+    # Columns a run of message_resolver reads: the index, the target, the standard column and the column _compare_num_rows checks
+    # (e.g. for open_excel_file(columns=...); the Combined output then only holds these columns)
+    @staticmethod
+    def get_needed_columns(target_column, gpt_message, standard_column=None):
+        standard_column = standard_column or ExcelFileAnalyzer.DEFAULT_STANDARD_COLUMNS.get(gpt_message)
+        checked_column = "category" if gpt_message in ("summarize opinion", "summarize eval") else "opinion"
+        return list(dict.fromkeys(column for column in (ExcelFileAnalyzer.INDEX, target_column, standard_column, checked_column) if column))
 
     @log_function_call
     def combine_two_excel_files(self, mode='none', num=-1, base_df=None, extra_df=None):
@@ -182,8 +257,8 @@ class ExcelFileAnalyzer(Observable):
 
         # Load the dataframes (if called from the classificaiton method, the dataframes are already loaded)
         if mode != 'df ready':
-            base_df = pd.read_excel(self.excel_files[0], engine='openpyxl')
-            extra_df = pd.read_excel(self.excel_files[1], engine='openpyxl')
+            base_df = WorkbookLoader.read_excel(self.excel_files[0])
+            extra_df = WorkbookLoader.read_excel(self.excel_files[1])
             self._change_log_context(f"Combine two excel files: ({os.path.basename(self.excel_files[0])} and {os.path.basename(self.excel_files[1])})")
         elif mode == 'df ready':
             self._change_log_context(f"Combine ({self.file_name}) into origianl file (after GPT classification or summarization)")
@@ -198,25 +273,18 @@ class ExcelFileAnalyzer(Observable):
         # Merge and save the dataframes
         combined_df = base_df.merge(extra_df, on=ExcelFileAnalyzer.INDEX, how='left')
 
+        # Both files (in every selected format) are written at the same time
         if(mode == 'df ready'):
-            combined_file_name = f"Combined({self.file_name}).xlsx"
-            combined_df.to_excel(combined_file_name, index=False, engine='openpyxl')
-            extra_file_name = f"Extra({self.file_name}).xlsx"
-            extra_df.to_excel(extra_file_name, index=False, engine='openpyxl')
+            WorkbookWriter.write_frames([(combined_df, f"Combined({self.file_name})"), (extra_df, f"Extra({self.file_name})")], self.output_formats)
             return
 
-        combined_file_name = f"Combined({os.path.basename(self.excel_files[0])}_{os.path.basename(self.excel_files[1])}).xlsx"
-        combined_df.to_excel(combined_file_name, index=False, engine='openpyxl')
-
-        extra_file_name = f"Extra({os.path.basename(self.excel_files[0])}_{os.path.basename(self.excel_files[1])}).xlsx"
-        extra_df.to_excel(extra_file_name, index=False, engine='openpyxl')
+        file_names = f"{os.path.basename(self.excel_files[0])}_{os.path.basename(self.excel_files[1])}"
+        for file_name in WorkbookWriter.write_frames([(combined_df, f"Combined({file_names})"), (extra_df, f"Extra({file_names})")], self.output_formats):
+            print(f"{file_name} saved successfully.")
 
-        print(f"{combined_file_name} saved successfully.")
-        print(f"{extra_file_name} saved successfully.")
-
-    # TODO: Concatenate multiple excel files
+    # source_column: if given, tag every row with the name of the file it came from
     @log_function_call
-    def concatenate_excel_files(self):
+    def concatenate_excel_files(self, source_column=None, max_workers=None):
         excel_files = self.notify("request_mutiple_excel_files")
 
         if not excel_files:
@@ -228,67 +296,87 @@ class ExcelFileAnalyzer(Observable):
         # Sort the actual file paths by their filenames
         sorted_files = sorted(excel_files, key=ExcelFileAnalyzer.natural_sort_key)
 
-        # Initialize the base dataframe using the first file
-        base_df = pd.read_excel(sorted_files[0], engine='openpyxl')
-        # base_df.insert(0, 'date', sorted_files_names[0])  # Add the filename as the first column
-
-         # Process the rest of the files
-        for i, excel_file in enumerate(sorted_files[1:], start=1):
-            df_tmp = pd.read_excel(excel_file, engine='openpyxl')
-            # df_tmp.insert(0, 'date', sorted_files_names[i])  # Add the filename as the first column
-            base_df = pd.concat([base_df, df_tmp])
+        # Parse the files in parallel and concatenate them once (schemas and dtypes are aligned)
+        base_df = WorkbookLoader.read_many(sorted_files, source_column=source_column, max_workers=max_workers)
         
-        base_df.to_excel(f"Concatenated({sorted_files_names[0]}_{sorted_files_names[-1]}).xlsx", index=False, engine='openpyxl')
+        WorkbookWriter.write_frame(base_df, f"Concatenated({sorted_files_names[0]}_{sorted_files_names[-1]}).xlsx")
 
+    # Write one file per value of key_column (xlsx, csv or parquet)
     @log_function_call
-    def divide_excel_file(self):
+    def divide_excel_file(self, key_column='date', output_format='xlsx', max_workers=None):
         excel_file = self.notify("request_excel_file")
-        df = pd.read_excel(excel_file, engine='openpyxl')
-        unique_dates = df['date'].unique()
-        for date in unique_dates:
-            # Filter the dataframe for the specific date
-            df_filtered = df[df['date'] == date]
-            
-            # Save the filtered dataframe to an Excel file
-            file_name = f"data_{date}.xlsx"
-            df_filtered.to_excel(file_name, index=False)
-            print(f"Saved data for date {date} to {file_name}")
-        pass
+        if not excel_file:
+            self.notify("show_error", message="No file selected.")
+            return
+
+        df = WorkbookLoader.read_excel(excel_file)
+        if key_column not in df.columns:
+            self.notify("show_error", message=f"Column '{key_column}' not found.")
+            return
+
+        # Group once and write the partitions in parallel workers
+        file_names = WorkbookWriter.write_partitions(df, key_column, output_format=output_format, max_workers=max_workers)
+        print(f"Saved {len(file_names)} files divided by '{key_column}'")
 
     # Private methods
 
+    # Audit the rows shared by the two dataframes with a single hash join on the common column
+    # Returns a report of duplicated keys, keys missing on either side and mismatching values
     @log_function_call
     def _check_two_excel_files_match(self, base_df, extra_df, common_column='no', target_column='opinion'):
         # Ensure the target column exists in both dataframes
         if target_column not in base_df.columns or target_column not in extra_df.columns:
-            self.notify("show_error", message=f"Column '{target_column}' not found in one or both dataframes.")
-            return
+            self.post("show_error", coalesce=False, message=f"Column '{target_column}' not found in one or both dataframes.")
+            return None
+
+        base = base_df[[common_column, target_column]]
+        extra = extra_df[[common_column, target_column]]
+
+        report = {
+            'duplicates_in_base': base.loc[base[common_column].duplicated(), common_column].unique().tolist(),
+            'duplicates_in_extra': extra.loc[extra[common_column].duplicated(), common_column].unique().tolist(),
+        }
 
-        common_indices = base_df[common_column][base_df[common_column].isin(extra_df[common_column])]
+        # As before, the first row of a duplicated key is the one that is compared
+        joined = base.drop_duplicates(common_column).merge(extra.drop_duplicates(common_column), on=common_column,
+                                                            how='outer', suffixes=('_base', '_extra'), indicator=True)
+        report['missing_in_extra'] = joined.loc[joined['_merge'] == 'left_only', common_column].tolist()
+        report['missing_in_base'] = joined.loc[joined['_merge'] == 'right_only', common_column].tolist()
 
-        for idx in common_indices:
-            base_opinion = base_df.loc[base_df[common_column] == idx, target_column].values[0]
-            extra_opinion = extra_df.loc[extra_df[common_column] == idx, target_column].values[0]
-            if base_opinion != extra_opinion:
-                logging.critical(f"Opinion mismatch at index {idx}.")
+        both = joined[joined['_merge'] == 'both']
+        base_values, extra_values = both[f"{target_column}_base"], both[f"{target_column}_extra"]
+        differs = (base_values != extra_values) & ~(base_values.isna() & extra_values.isna())
+        report['mismatches'] = both.loc[differs, [common_column, f"{target_column}_base", f"{target_column}_extra"]].reset_index(drop=True)
+
+        self.logger.critical(f"Match report on '{target_column}': {len(report['mismatches'])} mismatches, "
+                         f"{len(report['missing_in_base'])} missing in base, {len(report['missing_in_extra'])} missing in extra, "
+                         f"{len(report['duplicates_in_base'])} duplicated in base, {len(report['duplicates_in_extra'])} duplicated in extra")
+        if not report['mismatches'].empty:
+            self.logger.critical(f"Mismatching rows:\n{report['mismatches'].to_string(index=False)}")
+
+        return report
 
     @log_function_call
-    def _start_summarization(self, gpt_message, standard, new_column_name):
+    def _start_summarization(self, gpt_message, standard, new_column_name, wait=False):
         if self.standard_column not in self.df.columns.values.tolist():
             self.notify("show_error", message="There are empty cells in the target column.")
             return
         self.df = self.df[self.df[self.standard_column] == standard]
-        self._start_threaded_run_gpt_classification(gpt_message, new_column_name)
+        self._start_threaded_run_gpt_classification(gpt_message, new_column_name, wait)
 
     @log_function_call
-    def _start_threaded_run_gpt_classification(self, gpt_message, new_column_name):
+    def _start_threaded_run_gpt_classification(self, gpt_message, new_column_name, wait=False):
         self.notify("clicked_gpt_classification_bt", message="Initiate GPT-Powered Classification...")
+        if wait:
+            self._run_gpt_classification(gpt_message, new_column_name)
+            return
         # Note: In Python, a single-element tuple must be followed by a comma ,
         #       When you pass gpt_message without a trailing comma, it doesn't create a tuple.
         thread = threading.Thread(target=self._run_gpt_classification, args=(gpt_message, new_column_name))
         thread.daemon = True
         thread.start()
     
+    # Runs on a background thread: the UI is updated through posted events, which the app drains on its own thread
     @log_function_call
     def _run_gpt_classification(self, gpt_message, new_column_name):
 
@@ -296,18 +384,54 @@ class ExcelFileAnalyzer(Observable):
         data_structs = [(idx, target, eval) if self.standard_column else (idx, target) for idx, target, eval 
                         in zip(self.df[ExcelFileAnalyzer.INDEX], self.df[self.target_column], self.df.get(self.standard_column, [None] * len(self.df)))]
 
+        # Resume an interrupted run: rows recorded in its checkpoint are not sent again
+        self.checkpoint = RunCheckpoint(self.filepath, gpt_message, self.target_column, self.standard_column, new_column_name)
+        data_structs = [data_tuple for data_tuple in data_structs if not self.checkpoint.is_done(data_tuple[0])]
+
+        # Send one representative per group of identical (normalized) texts and fan its answer out to the group
+        with self.metrics.span("dedupe"):
+            data_structs, groups = self._collapse_duplicates(data_structs)
+        record_values = lambda values: self.checkpoint.record(TextDeduplicator.expand(values, groups))
+
+        # Only rows whose content or prompt changed since an earlier run are sent again
+        cached_values, data_structs = GPTHandler.split_cached_rows(data_structs, gpt_message)
+        record_values(cached_values)
+        self.metrics.increment("cache_hits", len(cached_values))
+        self.metrics.increment("cache_misses", len(data_structs))
+
+        # Optionally a local model trained on earlier answers labels the rows it is confident about; only the rest is sent
+        local_values = {}
+        if self.local_classifier_threshold:
+            local_values, data_structs = GPTHandler.split_local_rows(data_structs, gpt_message, self.local_classifier_threshold)
+            record_values(local_values)
+            local_classifier = GPTHandler.get_local_classifier(gpt_message, self.local_classifier_threshold)
+            self.metrics.set_values(local_model=local_classifier.report if local_classifier else None)
+        self.metrics.set_values(cached_rows=len(cached_values), local_rows=len(local_values), gpt_rows=len(data_structs))
+
         # Chunk the tuples based on a token count
-        chunks = GPTHandler.get_chunked_tuples(data_structs, gpt_message)
-        self.notify("set_num_chunks", num_chunks=len(chunks))
+        with self.metrics.span("chunk"):
+            chunks = GPTHandler.get_chunked_tuples(data_structs, gpt_message)
+        self.metrics.set_values(chunks=len(chunks))
+        self.post("set_num_chunks", num_chunks=len(chunks))
 
         # Start the threaded process
-        context_identifier = "|".join([self.file_name, self.target_column, self.standard_column, new_column_name, gpt_message])
-        response_list = GPTHandler.start_threaded_get_response(context_identifier, chunks, gpt_message, lambda **kwargs: self.notify("set_processed_chunks", **kwargs))
+        context_identifier = "|".join([self.file_name, self.target_column, str(self.standard_column), new_column_name, gpt_message])
+        unresolved = {}
+        if chunks:
+            _, unresolved = GPTHandler.start_threaded_get_response(context_identifier, chunks, gpt_message, lambda **kwargs: self.post("set_processed_chunks", **kwargs),
+                                                   on_response=record_values, metrics=self.metrics,
+                                                   on_num_chunks=lambda **kwargs: self.post("set_num_chunks", **kwargs), logger=self.logger)
         print(f"Started threaded process for {context_identifier}")
-        logging.critical(f"Started threaded process for {context_identifier}")
+        self.logger.critical(f"Started threaded process for {context_identifier}")
+
+        # Rows left unanswered (e.g. after an outage) fail the run; every member of their duplicate group is missing as well
+        self.unresolved_rows = len(TextDeduplicator.expand(dict.fromkeys(unresolved), groups))
+        if self.unresolved_rows:
+            self.post("show_error", coalesce=False, message=f"{self.unresolved_rows} rows could not be classified; run the classification again to resume them.")
 
-        # Process the result
-        self._create_new_column_for_classification(response_list, new_column_name=new_column_name) # TODO: Handle the case where there's already a column named 'category'
+        # Process the result (the checkpoint holds the cached, resumed and newly received rows)
+        with self.metrics.span("merge"):
+            self._create_new_column_for_classification(self.checkpoint.get_values(), new_column_name=new_column_name) # TODO: Handle the case where there's already a column named 'category'
         
         # log any missing values
         # TODO: Remove hard-coded values
@@ -316,17 +440,56 @@ class ExcelFileAnalyzer(Observable):
         elif gpt_message == "summarize opinion" or gpt_message == "summarize eval":
             self._compare_num_rows(self.df_original[self.df_original[self.standard_column] == '의견'], self.df, "category", f"{self.file_name}_log.txt")
 
-        self.combine_two_excel_files(mode='df ready', base_df=self.df_original, extra_df=self.df)
-        self.notify("update_save_label", message="Saved!")
+        # Earlier outputs are kept when nothing was classified
+        values = self.checkpoint.get_values()
+        if values:
+            with self.metrics.span("write"):
+                self.combine_two_excel_files(mode='df ready', base_df=self.df_original, extra_df=self.df)
+        else:
+            self.post("show_error", coalesce=False, message=f"No rows of {self.file_name} were classified; the outputs were not written.")
+        self.checkpoint.complete(self.unresolved_rows)
+
+        # The run's metrics go next to its checkpoint: a JSON report and the Prometheus text format
+        report_file = os.path.join(self.checkpoint.run_dir, "report.json")
+        self.metrics.write_report(report_file, run_id=self.checkpoint.run_id, file=self.file_name, prompt=gpt_message,
+                                  target_column=self.target_column, standard_column=self.standard_column, new_column=new_column_name)
+        self.metrics.write_prometheus(os.path.join(self.checkpoint.run_dir, "metrics.prom"))
+        stages = ", ".join(f"{stage} {entry['total_seconds']:.2f}s" for stage, entry in self.metrics.get_report()["stages"].items())
+        print(f"Run report saved to {report_file} ({stages})")
+        self.logger.critical(f"Run report for {context_identifier}: {report_file} ({stages})")
+        if values:
+            self.post("update_save_label", message="Saved!")
 
         # Clear the data
         self._clear_result()
 
+    @log_function_call
+    def _collapse_duplicates(self, data_structs):
+        representatives, groups = TextDeduplicator.collapse(data_structs)
+        self.metrics.set_values(rows=len(data_structs), unique_rows=len(representatives), duplicate_rows=len(data_structs) - len(representatives))
+
+        # Optionally cluster the remaining near-identical texts as well (MinHash/LSH)
+        if self.near_duplicate_threshold:
+            unique_rows = len(representatives)
+            representatives, near_groups = TextDeduplicator.cluster_near_duplicates(representatives, self.near_duplicate_threshold)
+            groups = TextDeduplicator.merge_groups(near_groups, groups)
+            self.duplicate_sources = TextDeduplicator.get_sources(groups)
+            self.metrics.set_values(near_duplicate_rows=unique_rows - len(representatives), clusters=len(representatives))
+
+        duplicates = len(data_structs) - len(representatives)
+        tokens_saved = sum(GPTHandler.get_row_token_counts(data_structs)) - sum(GPTHandler.get_row_token_counts(representatives))
+        self.metrics.set_values(tokens_saved_by_dedup=tokens_saved)
+        print(f"Collapsed {duplicates} duplicate rows out of {len(data_structs)}, saving {tokens_saved} tokens")
+
+        return representatives, groups
+
     @log_function_call
     def _clear_result(self):
-        self.df = self.df_original.copy()
-        self.notify("set_num_chunks", num_chunks=0)
-        self.notify("set_processed_chunks", processed_chunks=0)
+        self.df = self.df_original.copy(deep=False)
+        self.metrics = Metrics()
+        self.duplicate_sources = {}
+        self.post("set_num_chunks", num_chunks=0)
+        self.post("set_processed_chunks", processed_chunks=0)
         GPTHandler.clear()
 
     # Compare the number of rows in a specific column
@@ -341,46 +504,12 @@ class ExcelFileAnalyzer(Observable):
         else:
             print(f"No difference in the number of rows in column {col_name}")
 
+    # values: {idx: value} parsed by the workers as the responses arrived
     @log_function_call
-    def _create_new_column_for_classification(self, response_list, new_column_name):
-        self.df[new_column_name] = None
-
-        for _, response in response_list:
-
-            lines = [line.strip() for line in response.split("\n") if line.strip()]
-            parsed_data = {}
-
-            # Sometimes the output format is [index:value] and sometimes it's [index1, index2:value]
-            for idx, line in enumerate(lines, start=1):
-                if ':' not in line:
-                    # Logging or handling the line without a colon, if needed
-                    print(f"Warning: Unexpected format in line '{line}', {_}th response, {idx}th line: {line}")
-                    continue
-                indices, value = line.split(":", 1)
-
-                # If there's a dash, tilde or comma, split accordingly
-                separators = ['-', '~', ',']
-                for sep in separators:
-                    if sep in indices:
-                        indices = [int(idx.strip()) for idx in indices.split(sep)]
-                        break
-
-                # If indices is still a string (i.e., not a list), it means it's a single index
-                if isinstance(indices, str):
-                    try:
-                        indices = [int(indices.strip())]
-                    except Exception as e:
-                        continue
-                
-                value = value.strip()
-                for idx in indices:
-                    parsed_data[idx] = value
-            
-            # Map the values, but retain the original where there's no mapping
-            mapped_series = self.df[ExcelFileAnalyzer.INDEX].map(parsed_data)
-
-            # Create a new column and combine the mapped series with the original
-            self.df[new_column_name] = self.df[new_column_name].combine_first(mapped_series)
+    def _create_new_column_for_classification(self, values, new_column_name):
+        # A single vectorized assignment; rows without a value stay empty
+        self.df[new_column_name] = self.df[ExcelFileAnalyzer.INDEX].map(values)
 
-
-    
+        # Audit column: the row whose answer each row inherited through near-duplicate clustering
+        if self.duplicate_sources:
+            self.df[f"{new_column_name}_source"] = self.df[ExcelFileAnalyzer.INDEX].map(self.duplicate_sources)
@@ -1,177 +1,579 @@
 import functools
 import json
 import os
-import openai
-import tiktoken
 import threading
 import inspect
-import pickle
 import hashlib
 import os
+import time
 import logging, sys
 import SystemMessages
+from concurrent.futures import ThreadPoolExecutor, wait
+from RequestScheduler import RequestScheduler
+from ResponseCache import ResponseCache
+from Metrics import Metrics
 
 MAX_TOKENS_FOR_CURRENT_MODEL = 1500 # TODO: Add a feature that allows the user to select the model
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+MODEL = "gpt-3.5-turbo"
+REQUEST_TIMEOUT = 120 # seconds
+EXPECTED_COMPLETION_RATIO = 0.5 # expected output tokens per input token of a chunk (used for rate limiting)
+MAX_REPAIR_ROUNDS = 2 # times the missing or malformed rows of a run are re-asked
+MAX_REPAIR_CHUNKS = 100 # repair chunks sent per run at most, to cap the extra cost
+REPAIR_CHUNK_ROWS = 20 # rows per repair chunk (small chunks are answered more reliably)
 
 class GPTHandler:
 
     CACHE_DIR = "cache"
-    cache = {}  # initialize an empty cache
 
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-    
     # class variables
     lock = threading.Lock()
-    encoding = tiktoken.get_encoding("cl100k_base")
-    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    processed_chunks = 0
+    init_lock = threading.Lock()  # guards the lazy initialization below
+    processed_chunks = 0  # across all runs; every run also counts its own chunks
+    scheduler = None  # shared by every run, so that concurrent runs respect the same rate limits
+
+    # Loaded on first use (see the get_* accessors), so that starting the app does not pay for them
+    openai = None
+    encoding = None
+    response_cache = None
+
+    # "thread": blocking openai client on the scheduler's worker pool
+    # "asyncio": many in-flight requests multiplexed over one pooled keep-alive session
+    BACKENDS = ("thread", "asyncio")
+    backend = "thread"
+    async_concurrency = None  # None: AsyncChatClient's defaults
+    async_request_timeout = None
+
+    # Local models by (gpt_message, threshold), see get_local_classifier
+    local_classifier_lock = threading.Lock()
+    local_classifiers = {}
+
+    # Token counts memoized by content hash, shared by every prompt that chunks the same rows
+    TOKEN_COUNT_BATCH_SIZE = 10000
+    token_count_lock = threading.Lock()
+    token_counts = {}
+    chunking_seconds = 0.0
 
     # Decorators
+    # Records the call count and time of the function (Metrics.function_calls) instead of printing every call
     def log_function_call(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # print(f"Calling function {func.__name__} with args={args} and kwargs={kwargs}")
-            print(f"Calling function {func.__name__}...")
-            return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                Metrics.record_call(func.__name__, time.perf_counter() - started)
         return wrapper
 
     @staticmethod
-    def _get_file_identifier(combined_string):
-        return hashlib.md5(combined_string.encode()).hexdigest()
+    def _get_prompt(gpt_message):
+        return "\n".join(SystemMessages.ALL_MESSAGES[gpt_message])
+
+    # Split the rows into values already in the cache ({idx: value}) and the rows that still have to be sent
+    @staticmethod
+    def split_cached_rows(data_structs, gpt_message):
+        prompt = GPTHandler._get_prompt(gpt_message)
+        keys = [ResponseCache.get_key(MODEL, prompt, GPTHandler._format_content(data_tuple)) for data_tuple in data_structs]
+        entries = GPTHandler.get_response_cache().get_many(set(keys))
+
+        cached_values = {}
+        missing_structs = []
+        for data_tuple, key in zip(data_structs, keys):
+            if key in entries:
+                cached_values[data_tuple[0]] = entries[key]["value"]
+            else:
+                missing_structs.append(data_tuple)
+
+        print(f"{inspect.currentframe().f_code.co_name}: {len(cached_values)} rows found in cache, {len(missing_structs)} rows to send")
+        return cached_values, missing_structs
+
+    # Split the rows into values a local model trained on earlier answers labels confidently ({idx: value})
+    # and the rows that still have to be sent
+    @staticmethod
+    def split_local_rows(data_structs, gpt_message, threshold=None):
+        classifier = GPTHandler.get_local_classifier(gpt_message, threshold)
+        if classifier is None:
+            return {}, data_structs
+
+        labels, uncertain = classifier.split_confident([GPTHandler._format_content(data_tuple) for data_tuple in data_structs])
+        local_values = {data_structs[position][0]: label for position, label in labels.items()}
+        print(f"{inspect.currentframe().f_code.co_name}: {len(local_values)} rows labeled locally, {len(uncertain)} rows to send")
+        return local_values, [data_structs[position] for position in uncertain]
+
+    # The local model of a prompt is trained on the cached answers once per process; None if there is not enough data
+    @staticmethod
+    def get_local_classifier(gpt_message, threshold=None):
+        with GPTHandler.local_classifier_lock:
+            key = (gpt_message, threshold)
+            if key not in GPTHandler.local_classifiers:
+                from LocalClassifier import LocalClassifier  # scikit-learn is only loaded when the local tier is used
+                GPTHandler.local_classifiers[key] = LocalClassifier.from_cache(GPTHandler.get_response_cache(), MODEL, gpt_message,
+                                                                               GPTHandler._get_prompt(gpt_message), threshold)
+            return GPTHandler.local_classifiers[key]
 
+    # Store the parsed values of a response row by row, using the contents that were sent in the chunk
     @staticmethod
-    def _create_cache_key(file_identifier, chunk_identifier):
-        return str(hash(f"{file_identifier}_{chunk_identifier}"))
-    
+    def _save_response_to_cache(chunk, parsed_data, gpt_message):
+        prompt = GPTHandler._get_prompt(gpt_message)
+        prompt_hash = ResponseCache.get_prompt_hash(prompt)
+        contents = GPTHandler._split_chunk(chunk)
+        entries = {}
+        for idx, value in parsed_data.items():
+            if idx in contents:
+                key = ResponseCache.get_key(MODEL, prompt, contents[idx])
+                entries[key] = {"model": MODEL, "prompt_hash": prompt_hash, "gpt_message": gpt_message, "content": contents[idx], "value": value}
+        GPTHandler.get_response_cache().put_many(entries)
+
+    # Parse "index:value" lines into [(indices, value, is_range)]
+    # Sometimes the output format is [index:value] and sometimes it's [index1, index2:value]
     @staticmethod
-    def _save_to_cache(file_identifier, chunk_identifier, response):
-        cache_file = os.path.join(GPTHandler.CACHE_DIR, f"{file_identifier}_{chunk_identifier}.pkl")
-        with open(cache_file, 'wb') as f:
-            pickle.dump(response, f)
-    
+    def _parse_response_lines(response, idx_response=None):
+        lines = [line.strip() for line in response.split("\n") if line.strip()]
+        parsed_lines = []
+
+        for idx, line in enumerate(lines, start=1):
+            if ':' not in line:
+                # Logging or handling the line without a colon, if needed
+                print(f"Warning: Unexpected format in line '{line}', {idx_response}th response, {idx}th line: {line}")
+                continue
+            indices, value = line.split(":", 1)
+            is_range = False
+
+            # If there's a dash, tilde or comma, split accordingly
+            try:
+                separators = ['-', '~', ',']
+                for sep in separators:
+                    if sep in indices:
+                        indices = [int(idx.strip()) for idx in indices.split(sep)]
+                        is_range = sep != ','
+                        break
+
+                # If indices is still a string (i.e., not a list), it means it's a single index
+                if isinstance(indices, str):
+                    indices = [int(indices.strip())]
+            except Exception as e:
+                continue
+
+            parsed_lines.append((indices, value.strip(), is_range))
+
+        return parsed_lines
+
+    # Parse "index:value" lines into {index: value}
+    @staticmethod
+    def parse_response(response, idx_response=None):
+        parsed_data = {}
+        for indices, value, _ in GPTHandler._parse_response_lines(response, idx_response):
+            for idx in indices:
+                parsed_data[idx] = value
+        return parsed_data
+
+    # Compare a response with the rows sent in its chunk
+    # Returns the accepted {idx: value} and the {idx: content} of the rows that are missing, duplicated or malformed
     @staticmethod
-    def _get_from_cache(file_identifier, chunk_identifier):
-        cache_file = os.path.join(GPTHandler.CACHE_DIR, f"{file_identifier}_{chunk_identifier}.pkl")
-        if os.path.exists(cache_file):
-            with open(cache_file, 'rb') as f:
-                return pickle.load(f)
-        return None
+    def validate_response(chunk, response, idx_response=None):
+        contents = GPTHandler._split_chunk(chunk)
+        values = {}
+        rejected = set()
+
+        for indices, value, is_range in GPTHandler._parse_response_lines(response, idx_response):
+            if is_range:
+                # A range such as 41-44 does not say which value belongs to which row
+                low, high = min(indices), max(indices)
+                rejected.update(idx for idx in contents if low <= idx <= high)
+                continue
+            for idx in indices:
+                if idx in values and values[idx] != value:
+                    rejected.add(idx)
+                values[idx] = value
+
+        accepted = {idx: value for idx, value in values.items() if idx in contents and idx not in rejected}
+        repairs = {idx: content for idx, content in contents.items() if idx not in accepted}
+        return accepted, repairs
 
     @staticmethod
     def clear():
         GPTHandler.processed_chunks = 0
 
+    # The openai module is imported on the first request (it also pulls in aiohttp and requests)
+    @staticmethod
+    def get_openai():
+        with GPTHandler.init_lock:
+            if GPTHandler.openai is None:
+                import openai
+                openai.api_key = os.environ.get('OPENAI_API_KEY')
+                # Point OPENAI_API_BASE at a local stub server (e.g. one that returns 429s) to exercise the scheduler
+                openai.api_base = os.environ.get('OPENAI_API_BASE', openai.api_base)
+                GPTHandler.openai = openai
+            return GPTHandler.openai
+
+    @staticmethod
+    def get_encoding():
+        with GPTHandler.init_lock:
+            if GPTHandler.encoding is None:
+                import tiktoken
+                GPTHandler.encoding = tiktoken.encoding_for_model(MODEL)
+            return GPTHandler.encoding
+
+    # Responses are cached per row, keyed by (model, prompt, row content), in one SQLite file
+    # The cache directory is created on first use
+    @staticmethod
+    def get_response_cache():
+        with GPTHandler.init_lock:
+            if GPTHandler.response_cache is None:
+                os.makedirs(GPTHandler.CACHE_DIR, exist_ok=True)
+                GPTHandler.response_cache = ResponseCache(os.path.join(GPTHandler.CACHE_DIR, "responses.sqlite3"))
+            return GPTHandler.response_cache
+
+    # Replace the response store, e.g. to change its size cap
+    @staticmethod
+    def configure_cache(db_path=None, max_bytes=None):
+        response_cache = GPTHandler.get_response_cache()
+        response_cache.flush()
+        with GPTHandler.init_lock:
+            GPTHandler.response_cache = ResponseCache(db_path or response_cache.db_path, max_bytes)
+            return GPTHandler.response_cache
+
+    @staticmethod
+    def get_scheduler():
+        with GPTHandler.lock:
+            if GPTHandler.scheduler is None:
+                GPTHandler.scheduler = RequestScheduler()
+            return GPTHandler.scheduler
+
+    # Replace the shared scheduler, e.g. to match the rate limits of the account
+    @staticmethod
+    def configure_scheduler(max_workers=None, requests_per_minute=None, tokens_per_minute=None, max_retries=None):
+        with GPTHandler.lock:
+            if GPTHandler.scheduler is not None:
+                GPTHandler.scheduler.shutdown(wait=False)
+            GPTHandler.scheduler = RequestScheduler(max_workers, requests_per_minute, tokens_per_minute, max_retries)
+            return GPTHandler.scheduler
+
+    @staticmethod
+    def configure_backend(backend, concurrency=None, request_timeout=None):
+        if backend not in GPTHandler.BACKENDS:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Unknown backend '{backend}' (expected one of {GPTHandler.BACKENDS}).")
+        GPTHandler.backend = backend
+        GPTHandler.async_concurrency = concurrency or GPTHandler.async_concurrency
+        GPTHandler.async_request_timeout = request_timeout or GPTHandler.async_request_timeout
+
+    # Tokens a chunk is expected to consume (prompt + chunk + expected completion)
+    @staticmethod
+    def get_request_costs(chunks, gpt_message):
+        system_message, assistant_message = SystemMessages.ALL_MESSAGES[gpt_message]
+        prompt_tokens = GPTHandler.get_token_count(system_message) + GPTHandler.get_token_count(assistant_message)
+        return [prompt_tokens + int(token_count * (1 + EXPECTED_COMPLETION_RATIO)) for token_count in GPTHandler.get_token_counts(chunks)]
+
     @staticmethod 
     def get_token_count(content):
-        return len(GPTHandler.encoding.encode(content))
-    
+        return GPTHandler.get_token_counts([content])[0]
+
+    # Count tokens for many contents at once: only unseen contents are encoded, in multi-threaded batches
     @staticmethod
-    def get_chunked_tuples(data_structs, gpt_message):
-        chunks = []
-        current_chunk = ""
-        current_token_count = 0
+    def get_token_counts(contents):
+        keys = [GPTHandler._get_content_hash(content) for content in contents]
 
-        system_message = gpt_message[0]
-        assistant_message = gpt_message[1]
+        missing = {}
+        for key, content in zip(keys, contents):
+            if key not in GPTHandler.token_counts and key not in missing:
+                missing[key] = content
 
-        max_tokens = MAX_TOKENS_FOR_CURRENT_MODEL - GPTHandler.get_token_count(system_message) - GPTHandler.get_token_count(assistant_message)
+        missing = list(missing.items())
+        for start in range(0, len(missing), GPTHandler.TOKEN_COUNT_BATCH_SIZE):
+            batch = missing[start:start + GPTHandler.TOKEN_COUNT_BATCH_SIZE]
+            encoded = GPTHandler.get_encoding().encode_batch([content for _, content in batch], num_threads=os.cpu_count() or 1)
+            with GPTHandler.token_count_lock:
+                GPTHandler.token_counts.update((key, len(tokens)) for (key, _), tokens in zip(batch, encoded))
 
-        # TODO: Add a feature that detects whether current chunk is too large for the model 
-        for data_tuple in data_structs:
+        return [GPTHandler.token_counts[key] for key in keys]
+
+    # Tokens each data tuple takes up in a chunk
+    @staticmethod
+    def get_row_token_counts(data_structs):
+        return GPTHandler._get_row_token_counts([(data_tuple[0], GPTHandler._format_content(data_tuple)) for data_tuple in data_structs])
 
-            if len(data_tuple) == 3:
-                idx, target, eval = data_tuple
-            elif len(data_tuple) == 2:
-                idx, target = data_tuple
-                eval = None
+    @staticmethod
+    def get_chunked_tuples(data_structs, gpt_message):
+        start_time = time.perf_counter()
 
-            target = str(target).replace('\n', ' ')
-            data = str(idx) + ":" + target
-            if eval is not None:
-                data += ":" + eval + "\n"
+        # Format every row first so that the token counts are computed in one batch
+        rows = [GPTHandler._format_row(data_tuple) for data_tuple in data_structs]
+        chunks = GPTHandler._chunk_rows(rows, GPTHandler.get_row_token_counts(data_structs), GPTHandler._get_max_chunk_tokens(gpt_message))
 
-            token_count = GPTHandler.get_token_count(data)
+        GPTHandler.chunking_seconds = time.perf_counter() - start_time
+        print(f"Chunked {len(rows)} rows into {len(chunks)} chunks in {GPTHandler.chunking_seconds:.3f}s")
+        
+        return chunks
+
+    @staticmethod
+    def _get_max_chunk_tokens(gpt_message):
+        system_message, assistant_message = SystemMessages.ALL_MESSAGES[gpt_message]
+        return MAX_TOKENS_FOR_CURRENT_MODEL - GPTHandler.get_token_count(system_message) - GPTHandler.get_token_count(assistant_message)
+
+    # Pack formatted rows into chunks of at most max_tokens tokens (and max_rows rows, if given)
+    @staticmethod
+    def _chunk_rows(rows, token_counts, max_tokens, max_rows=None):
+        chunks = []
+        current_rows = []
+        current_token_count = 0
+
+        # TODO: Add a feature that detects whether current chunk is too large for the model 
+        for data, token_count in zip(rows, token_counts):
             
-            if (current_token_count + token_count) > max_tokens:
+            if ((current_token_count + token_count) > max_tokens or len(current_rows) == max_rows) and current_rows:
                 # If token limit exceeded, finalize the current chunk and start a new one
-                current_chunk = current_chunk[:-1] # Remove the last newline
-                chunks.append(current_chunk)
-                current_chunk = ""
+                chunks.append("".join(current_rows)[:-1]) # Remove the last newline
+                current_rows = []
                 current_token_count = 0
 
-            current_chunk += data
+            current_rows.append(data)
             current_token_count += token_count
         
         # Add the last chunk if it has any data
-        if current_chunk:
-            chunks.append(current_chunk)
-        
+        if current_rows:
+            chunks.append("".join(current_rows)[:-1])
+
         return chunks
 
+    # Small chunks holding the rows that have to be asked again
+    @staticmethod
+    def _get_repair_chunks(repairs, gpt_message):
+        rows = [f"{idx}:{content}\n" for idx, content in repairs.items()]
+        return GPTHandler._chunk_rows(rows, GPTHandler._get_row_token_counts(list(repairs.items())), GPTHandler._get_max_chunk_tokens(gpt_message), REPAIR_CHUNK_ROWS)
+
+    # Token counts of "index:content" rows ([(index, content)]). Counts are memoized on the contents alone, so repeated
+    # answers and re-chunked rows are not encoded again; the prefix and newline add the cost of the longest index's
+    @staticmethod
+    def _get_row_token_counts(rows):
+        longest_idx = max((str(idx) for idx, _ in rows), key=len, default="")
+        row_overhead = GPTHandler.get_token_count(f"{longest_idx}:") + GPTHandler.get_token_count("\n")
+        return [row_overhead + token_count for token_count in GPTHandler.get_token_counts([content for _, content in rows])]
+
+    # Every row is one "index:content" line
+    @staticmethod
+    def _format_row(data_tuple):
+        return str(data_tuple[0]) + ":" + GPTHandler._format_content(data_tuple) + "\n"
+
+    @staticmethod
+    def _format_content(data_tuple):
+        if len(data_tuple) == 3:
+            idx, target, eval = data_tuple
+        elif len(data_tuple) == 2:
+            idx, target = data_tuple
+            eval = None
+
+        content = str(target).replace('\n', ' ')
+        if eval is not None:
+            content += ":" + str(eval).replace('\n', ' ')
+        return content
+
+    # Recover {index: content} from the lines of a chunk
+    @staticmethod
+    def _split_chunk(chunk):
+        contents = {}
+        for line in chunk.split("\n"):
+            idx, _, content = line.partition(":")
+            try:
+                contents[int(idx)] = content
+            except ValueError:
+                continue
+        return contents
+
+    @staticmethod
+    def _get_content_hash(content):
+        return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+    @staticmethod
+    def _get_messages(chunk, gpt_message):
+        return [
+            {"role": "system", "content": SystemMessages.ALL_MESSAGES[gpt_message][0]},
+            {"role": "assistant", "content": SystemMessages.ALL_MESSAGES[gpt_message][1]},
+            {"role": "user", "content": chunk},
+        ]
+
+    # on_request(seconds, usage) is called for every answered HTTP request (retried attempts included)
     @staticmethod
-    def __get_response_from_chatgpt(chunk, gpt_message):
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": SystemMessages.ALL_MESSAGES[gpt_message][0]},
-                {"role": "assistant", "content": SystemMessages.ALL_MESSAGES[gpt_message][1]},
-                {"role": "user", "content": chunk},
-            ],
+    def __get_response_from_chatgpt(chunk, gpt_message, on_request=None):
+        started = time.perf_counter()
+        response = GPTHandler.get_openai().ChatCompletion.create(
+            model=MODEL,
+            messages=GPTHandler._get_messages(chunk, gpt_message),
+            request_timeout=REQUEST_TIMEOUT,
         ) 
+        if on_request:
+            on_request(time.perf_counter() - started, response.get("usage") or {})
         return response.choices[0].message["content"].strip()
 
+    # Per-request latency and the token usage reported by the API
+    @staticmethod
+    def _get_request_recorder(metrics):
+        def record_request(seconds, usage):
+            metrics.observe("request_latency_seconds", seconds)
+            metrics.increment("requests")
+            metrics.increment("input_tokens", usage.get("prompt_tokens", 0))
+            metrics.increment("output_tokens", usage.get("completion_tokens", 0))
+        return record_request
+
     @staticmethod
     @log_function_call
-    def __threaded_get_response(file_identifier, idx_chunk, num_chunks, chunk, response_list, gpt_message, callback=None):
+    def __threaded_get_response(idx_chunk, chunk, cost, run, gpt_message):
 
-        response = GPTHandler._get_from_cache(file_identifier, idx_chunk)
+        # Rate-limited and retried by the scheduler; an error that survives the retries propagates to the caller
+        # The request span includes the time spent waiting for the rate limits and backing off
+        with run["metrics"].span("request"):
+            response = GPTHandler.get_scheduler().call(GPTHandler.__get_response_from_chatgpt, cost, chunk, gpt_message,
+                                                       GPTHandler._get_request_recorder(run["metrics"]))
 
-        try:
-            # Check if the response is in the cache first
-            if not response:  # If not in cache
-                response = GPTHandler.__get_response_from_chatgpt(chunk, gpt_message)
-                print(f"{response}")
-                GPTHandler._save_to_cache(file_identifier, idx_chunk, response)  # Store the response to the cache
-                print(f"({file_identifier}, {idx_chunk}) Response not in cache. Stored in cache.")
-            else:
-                print(f"({file_identifier}, {idx_chunk}) Response found in cache. Loaded from cache.")
+        return GPTHandler._record_response(idx_chunk, chunk, response, run, gpt_message)
+
+    # Responses are validated and parsed on the worker as soon as they arrive, overlapping with the other requests' network waits
+    # Returns (accepted, repairs); the coordinating thread merges them into run["results"] and run["repairs"]
+    # run: {"results": {idx: value}, "repairs": {idx: content}, "processed_chunks": int, "num_chunks": int, "metrics": Metrics, "callback": ..., "on_response": ...}
+    @staticmethod
+    def _record_response(idx_chunk, chunk, response, run, gpt_message):
+        with run["metrics"].span("parse"):
+            accepted, repairs = GPTHandler.validate_response(chunk, response, idx_chunk)
+        GPTHandler._save_response_to_cache(chunk, accepted, gpt_message)  # Store the rows of the response to the cache
+        run["metrics"].increment("rows_accepted", len(accepted))
+        run["metrics"].increment("rows_rejected", len(repairs))
+        if run["on_response"]:
+            run["on_response"](accepted)
+
+        # The progress counters are the only state the workers share
+        with GPTHandler.lock:
+            GPTHandler.processed_chunks += 1
+            run["processed_chunks"] += 1
+            processed_chunks = run["processed_chunks"]
 
-            with GPTHandler.lock:
-                response_list.append((idx_chunk, response))
-                GPTHandler.processed_chunks += 1
-                print(f"{idx_chunk + 1} received: {GPTHandler.processed_chunks}/{num_chunks} completed ({GPTHandler.get_token_count(response)} tokens)")
-                if callback:
-                    callback(processed_chunks=GPTHandler.processed_chunks)
+        print(f"{idx_chunk + 1} received: {processed_chunks}/{run['num_chunks']} completed")
+        # The callback must not block (e.g. it posts an event instead of updating the UI)
+        if run["callback"]:
+            run["callback"](processed_chunks=processed_chunks)
 
-        except Exception as e:
-            print(f"{inspect.currentframe().f_code.co_name}: An error occurred in thread {idx_chunk}: {e}")
+        return accepted, repairs
 
+    # Send chunks built from the cache misses of split_cached_rows
+    # Returns the parsed {idx: value} of all responses and the rows ({idx: content}) still missing after the retries and repair rounds
+    # on_response({idx: value}) lets the caller persist the rows of every response as soon as it arrives
+    # metrics: the run's Metrics (request/parse spans, request latencies, tokens, retries, repairs)
+    # on_num_chunks(num_chunks=...): called when repair rounds add chunks, so that the total stays ahead of callback's processed_chunks
     @staticmethod
-    def start_threaded_get_response(file_name, chunks, gpt_message, callback=None):
+    def start_threaded_get_response(file_name, chunks, gpt_message, callback=None, backend=None, on_response=None, metrics=None, on_num_chunks=None, logger=None):
 
         if not chunks:
             print(f"{inspect.currentframe().f_code.co_name}: Please ensure that chunks are created.")
-            return
+            return {}, {}
+
+        backend = backend or GPTHandler.backend
+        metrics = metrics or Metrics()
+        logger = logger or logging.getLogger()
+        run = {"results": {}, "repairs": {}, "processed_chunks": 0, "num_chunks": len(chunks), "metrics": metrics, "callback": callback,
+               "on_response": on_response}
+        unresolved = {}
+        repair_budget = MAX_REPAIR_CHUNKS
+        retries = GPTHandler.get_scheduler().retries  # the scheduler is shared, so concurrent runs count each other's retries
+
+        for repair_round in range(MAX_REPAIR_ROUNDS + 1):
+            costs = GPTHandler.get_request_costs(chunks, gpt_message)
+            metrics.increment("chunks_sent", len(chunks))
+
+            if backend == "asyncio":
+                failed = GPTHandler._get_responses_asyncio(chunks, costs, run, gpt_message)
+            else:
+                failed = GPTHandler._get_responses_threaded(chunks, costs, run, gpt_message)
+
+            metrics.increment("chunks_failed", len(failed))
+            for idx, error in failed:
+                print(f"{inspect.currentframe().f_code.co_name}: Chunk {idx} failed after retries: {error}")
+                logger.critical(f"Chunk {idx} of {file_name} failed after retries: {error}")
+                run["repairs"].update(GPTHandler._split_chunk(chunks[idx]))
+
+            # Only the rows that are missing, duplicated or malformed are asked again, in small chunks
+            repairs, run["repairs"] = run["repairs"], {}
+            if not repairs:
+                break
+            if repair_round == MAX_REPAIR_ROUNDS:
+                unresolved.update(repairs)
+                break
+
+            repair_chunks = GPTHandler._get_repair_chunks(repairs, gpt_message)
+            chunks = repair_chunks[:repair_budget]
+            repair_budget -= len(chunks)
+            for skipped_chunk in repair_chunks[len(chunks):]:
+                unresolved.update(GPTHandler._split_chunk(skipped_chunk))
+            if not chunks:
+                break
+            metrics.increment("repair_rounds")
+            metrics.increment("repair_rows", len(repairs))
+            # processed_chunks keeps counting across the rounds, so the total grows with them
+            run["num_chunks"] += len(chunks)
+            if on_num_chunks:
+                on_num_chunks(num_chunks=run["num_chunks"])
+            print(f"{inspect.currentframe().f_code.co_name}: Repair round {repair_round + 1}: re-sending {len(repairs)} rows in {len(chunks)} chunks")
+
+        if unresolved:
+            print(f"{inspect.currentframe().f_code.co_name}: {len(unresolved)} rows are still missing after the repair rounds")
+            logger.critical(f"{len(unresolved)} rows of {file_name} are still missing after the repair rounds: {sorted(unresolved)}")
+
+        response_cache = GPTHandler.get_response_cache()
+        response_cache.flush()
+        metrics.increment("retries", GPTHandler.get_scheduler().retries - retries)
+        metrics.set_values(unresolved_rows=len(unresolved), response_cache=response_cache.get_stats())
+
+        return run["results"], unresolved
+
+    @staticmethod
+    def _get_responses_threaded(chunks, costs, run, gpt_message):
+        scheduler = GPTHandler.get_scheduler()
+
+        # The chunks are queued on the shared bounded pool instead of one thread per chunk
+        futures = {scheduler.submit(GPTHandler.__threaded_get_response, idx, chunk, cost, run, gpt_message): idx
+                   for idx, (chunk, cost) in enumerate(zip(chunks, costs))}
+
+        # Wait for all chunks to finish
+        wait(futures)
+
+        failed = []
+        for future, idx in futures.items():
+            if future.exception():
+                failed.append((idx, future.exception()))
+                continue
+            accepted, repairs = future.result()
+            run["results"].update(accepted)
+            run["repairs"].update(repairs)
+
+        return failed
+
+    @staticmethod
+    def _get_responses_asyncio(chunks, costs, run, gpt_message):
+        failed = []
+        jobs = [(idx, GPTHandler._get_messages(chunk, gpt_message), cost) for idx, (chunk, cost) in enumerate(zip(chunks, costs))]
 
-        response_list = []
-        threads = []
-        num_chunks = len(chunks)
+        # Recording a response writes to the cache and fsyncs the checkpoint, which would stall every request in flight
+        # on the event loop; one recorder thread does it in arrival order, so the results can be merged without a lock
+        recorder = ThreadPoolExecutor(max_workers=1)
+        recordings = []
 
-        for idx, chunk in enumerate(chunks):
-            response_thread = threading.Thread(target=GPTHandler.__threaded_get_response, 
-                                               args=(GPTHandler._get_file_identifier(file_name), idx, num_chunks, chunk, response_list, gpt_message, callback),
-                                               daemon=True)
-            response_thread.start()
-            threads.append(response_thread)
+        def record(idx, response):
+            accepted, repairs = GPTHandler._record_response(idx, chunks[idx], response, run, gpt_message)
+            run["results"].update(accepted)
+            run["repairs"].update(repairs)
 
-        # Wait for all threads to finish
-        for thread in threads:
-            thread.join()
+        def record_response(idx, response):
+            recordings.append((idx, recorder.submit(record, idx, response)))
 
-        response_list.sort(key=lambda x: x[0])
+        from AsyncChatClient import AsyncChatClient  # imports aiohttp, so only when this backend is used
+        openai = GPTHandler.get_openai()
+        client = AsyncChatClient(openai.api_key, openai.api_base, MODEL, GPTHandler.get_scheduler(),
+                                 concurrency=GPTHandler.async_concurrency, request_timeout=GPTHandler.async_request_timeout,
+                                 on_request=GPTHandler._get_request_recorder(run["metrics"]))
+        # The requests overlap on one event loop, so the request span covers the whole batch here
+        with run["metrics"].span("request"):
+            try:
+                client.get_responses(jobs, record_response, lambda idx, error: failed.append((idx, error)))
+            finally:
+                recorder.shutdown(wait=True)
+        # A chunk whose recording failed is repaired like a failed request, as in the thread backend
+        failed.extend((idx, recording.exception()) for idx, recording in recordings if recording.exception())
 
-        return response_list
-    
-            
\ No newline at end of file
+        return failed
@@ -0,0 +1,90 @@
+import inspect
+from collections import Counter
+import numpy as np
+from sklearn.pipeline import make_pipeline
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+class LocalClassifier:
+
+    # Constants
+    THRESHOLD = 0.9  # rows predicted with a lower probability are left to GPT
+    HOLDOUT_FRACTION = 0.2
+    MIN_TRAINING_ROWS = 200
+    MIN_ROWS_PER_LABEL = 5  # rarer labels are left to GPT
+    MAX_LABELS = 20  # prompts with more distinct answers (e.g. summaries) are not classification tasks
+    MAX_TRAINING_ROWS = 200000
+    SEED = 42
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or LocalClassifier.THRESHOLD
+        self.model = None
+        self.report = {"trained": False}
+
+    # Train on labels GPT already returned (contents as sent, answers as parsed)
+    # A share of the rows is held out first to measure how often the model agrees with GPT; returns whether the model is usable
+    def train(self, contents, labels):
+        label_counts = Counter(labels)
+        kept_labels = {label for label, count in label_counts.items() if count >= LocalClassifier.MIN_ROWS_PER_LABEL}
+        rows = [(content, label) for content, label in zip(contents, labels) if label in kept_labels]
+
+        if len(rows) < LocalClassifier.MIN_TRAINING_ROWS or not 2 <= len(kept_labels) <= LocalClassifier.MAX_LABELS:
+            self.report = {"trained": False, "training_rows": len(rows), "labels": len(label_counts)}
+            print(f"{inspect.currentframe().f_code.co_name}: Not enough labeled rows to train a local model ({self.report})")
+            return False
+
+        contents, labels = [content for content, _ in rows], [label for _, label in rows]
+        train_contents, holdout_contents, train_labels, holdout_labels = train_test_split(
+            contents, labels, test_size=LocalClassifier.HOLDOUT_FRACTION, stratify=labels, random_state=LocalClassifier.SEED)
+
+        holdout_model = LocalClassifier._build_model().fit(train_contents, train_labels)
+        predicted, confidences = LocalClassifier._predict(holdout_model, holdout_contents)
+        agrees = predicted == np.asarray(holdout_labels, dtype=object)
+        confident = confidences >= self.threshold
+
+        self.report = {
+            "trained": True, "training_rows": len(rows), "labels": sorted(kept_labels), "threshold": self.threshold,
+            "holdout_rows": len(holdout_labels),
+            "holdout_agreement": float(agrees.mean()),  # every held-out row
+            "holdout_coverage": float(confident.mean()),  # share of rows the model would answer
+            "holdout_confident_agreement": float(agrees[confident].mean()) if confident.any() else None,  # on those rows
+        }
+
+        # The model in use is trained on every row
+        self.model = LocalClassifier._build_model().fit(contents, labels)
+        print(f"{inspect.currentframe().f_code.co_name}: Local model {self.report}")
+        return True
+
+    # Build a classifier from the rows a ResponseCache holds for a model and prompt; None if there is not enough data
+    @staticmethod
+    def from_cache(response_cache, model, gpt_message, prompt, threshold=None):
+        entries = response_cache.get_entries(model, gpt_message, prompt, limit=LocalClassifier.MAX_TRAINING_ROWS)
+        classifier = LocalClassifier(threshold)
+        if not classifier.train([content for content, _ in entries], [value for _, value in entries]):
+            return None
+        return classifier
+
+    # Split contents into {position: label} the model is confident about and the positions left for GPT
+    def split_confident(self, contents):
+        if self.model is None or not contents:
+            return {}, list(range(len(contents)))
+        predicted, confidences = LocalClassifier._predict(self.model, contents)
+        confident = confidences >= self.threshold
+        labels = {int(position): predicted[position] for position in np.flatnonzero(confident)}
+        return labels, [int(position) for position in np.flatnonzero(~confident)]
+
+    # Private methods
+
+    # Character n-grams work on short Korean answers without a morphological analyzer
+    @staticmethod
+    def _build_model():
+        return make_pipeline(
+            TfidfVectorizer(analyzer='char_wb', ngram_range=(1, 3), min_df=2, sublinear_tf=True),
+            LogisticRegression(max_iter=1000),
+        )
+
+    @staticmethod
+    def _predict(model, contents):
+        probabilities = model.predict_proba(contents)
+        return model.classes_[probabilities.argmax(axis=1)].astype(object), probabilities.max(axis=1)
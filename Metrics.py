@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+class Metrics:
+
+    # Constants
+    PREFIX = "excel_analyzer"
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)  # seconds
+
+    # Timings of the functions decorated with log_function_call, shared by the whole process
+    calls_lock = threading.Lock()
+    function_calls = {}
+
+    # One instance per run: stage spans, counters, values and latency histograms
+    # Every update is a few dictionary operations under a lock, cheap enough to leave on
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.values = {}
+        self.stages = {}
+        self.histograms = {}
+
+    @staticmethod
+    def record_call(function_name, seconds):
+        with Metrics.calls_lock:
+            entry = Metrics.function_calls.setdefault(function_name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    # Time a stage (load, dedupe, chunk, request, parse, merge, write); a stage may run many times and on many threads
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started)
+
+    def record_stage(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Values describing the run (row counts, the local model's report, ...); numbers are also exported as gauges
+    def set_values(self, **values):
+        with self.lock:
+            self.values.update(values)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.setdefault(name, {"buckets": [0] * (len(Metrics.LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0})
+            histogram["buckets"][bisect.bisect_left(Metrics.LATENCY_BUCKETS, seconds)] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def get_report(self, **context):
+        with self.lock:
+            histograms = {name: {"buckets": dict(zip([str(bound) for bound in Metrics.LATENCY_BUCKETS] + ["+Inf"], histogram["buckets"])),
+                                 "sum": histogram["sum"], "count": histogram["count"],
+                                 "mean": histogram["sum"] / histogram["count"] if histogram["count"] else None}
+                          for name, histogram in self.histograms.items()}
+            report = {**context, "started": self.started, "seconds": time.time() - self.started, "counters": dict(self.counters),
+                      "values": dict(self.values), "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+                      "histograms": histograms}
+        with Metrics.calls_lock:
+            report["functions"] = {name: dict(entry) for name, entry in Metrics.function_calls.items()}
+        return report
+
+    def write_report(self, file_name, **context):
+        Metrics._write_atomic(file_name, json.dumps(self.get_report(**context), ensure_ascii=False, indent=2, default=str))
+
+    # Prometheus text exposition format (e.g. for node_exporter's textfile collector)
+    def to_prometheus(self):
+        report = self.get_report()
+        lines = []
+
+        for name, value in sorted(report["counters"].items()):
+            metric = Metrics._get_metric_name(f"{name}_total")
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        for name, value in sorted(report["values"].items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = Metrics._get_metric_name(name)
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+        for label, metric_suffix, entries in (("stage", "stage_seconds", report["stages"]), ("function", "function_seconds", report["functions"])):
+            metric = Metrics._get_metric_name(metric_suffix)
+            lines.append(f"# TYPE {metric} summary")
+            for name, entry in sorted(entries.items()):
+                lines += [f'{metric}_sum{{{label}="{name}"}} {entry["total_seconds"]}', f'{metric}_count{{{label}="{name}"}} {entry["count"]}']
+
+        with self.lock:
+            histograms = {name: dict(histogram) for name, histogram in self.histograms.items()}
+        for name, histogram in sorted(histograms.items()):
+            metric = Metrics._get_metric_name(name)
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in Metrics.LATENCY_BUCKETS] + ["+Inf"], histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{metric}_sum {histogram['sum']}", f"{metric}_count {histogram['count']}"]
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_name):
+        Metrics._write_atomic(file_name, self.to_prometheus())
+
+    # Private methods
+
+    @staticmethod
+    def _get_metric_name(name):
+        return f"{Metrics.PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+    @staticmethod
+    def _write_atomic(file_name, text):
+        directory = os.path.dirname(file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{file_name}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, file_name)
@@ -0,0 +1,134 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+class MorphAnalyzer:
+
+    # Constants
+    DB_PATH = os.path.join("cache", "morphs.sqlite3")
+    BATCH_SIZE = 200  # texts per JVM call
+    PARALLEL_THRESHOLD = 5000  # texts to analyze before a process pool pays off
+    QUERY_BATCH_SIZE = 500  # keys per SELECT (stays below SQLite's variable limit)
+    SENTINEL = "QXSEPXQ"  # Okt tags it as a single Alpha token, so a joined batch can be split apart again
+    SEPARATOR = f"\n{SENTINEL}\n"
+
+    # One Okt (and JVM) per pool worker, created by the pool's initializer
+    worker_okt = None
+
+    def __init__(self, db_path=None, batch_size=None, max_workers=None):
+        self.db_path = db_path or MorphAnalyzer.DB_PATH
+        self.batch_size = batch_size or MorphAnalyzer.BATCH_SIZE
+        self.max_workers = max_workers
+        self.okt = None  # konlpy's tokenizer boots a JVM, so it is created on first use
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS morphs (key TEXT PRIMARY KEY, pos TEXT)")
+        self.connection.commit()
+
+    # [[(morph, tag), ...] for every text]; results are memoized by text hash across runs
+    def pos_many(self, texts):
+        texts = [str(text) for text in texts]
+        keys = [MorphAnalyzer._get_key(text) for text in texts]
+        results = self._load(set(keys))
+
+        # Every distinct text is analyzed once, however often it occurs
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in missing:
+                missing[key] = text
+
+        if missing:
+            analyzed = self._analyze(list(missing.values()))
+            new_results = dict(zip(missing, analyzed))
+            self._store(new_results)
+            results.update(new_results)
+
+        return [results[key] for key in keys]
+
+    # Same as okt.nouns / okt.morphs, which are both derived from okt.pos
+    def nouns_many(self, texts):
+        return [[morph for morph, tag in pos if tag == 'Noun'] for pos in self.pos_many(texts)]
+
+    def morphs_many(self, texts):
+        return [[morph for morph, _ in pos] for pos in self.pos_many(texts)]
+
+    def get_okt(self):
+        with self.lock:
+            if self.okt is None:
+                from konlpy.tag import Okt
+                self.okt = Okt()
+            return self.okt
+
+    # Private methods
+
+    @staticmethod
+    def _get_key(text):
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _load(self, keys):
+        keys = list(keys)
+        results = {}
+        with self.lock:
+            for start in range(0, len(keys), MorphAnalyzer.QUERY_BATCH_SIZE):
+                batch = keys[start:start + MorphAnalyzer.QUERY_BATCH_SIZE]
+                rows = self.connection.execute(f"SELECT key, pos FROM morphs WHERE key IN ({','.join('?' * len(batch))})", batch)
+                results.update((key, [tuple(item) for item in json.loads(pos)]) for key, pos in rows)
+        return results
+
+    def _store(self, results):
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO morphs (key, pos) VALUES (?, ?)",
+                                        [(key, json.dumps(pos, ensure_ascii=False)) for key, pos in results.items()])
+            self.connection.commit()
+
+    # Analyze in batches, on a process pool (one JVM per worker) when there are many texts
+    # The workers are spawned, not forked: a forked copy of a running JVM (or of the app's threads) hangs or crashes,
+    # and the pool never needs the parent's Okt
+    def _analyze(self, texts):
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+        if len(texts) < MorphAnalyzer.PARALLEL_THRESHOLD or self.max_workers == 1:
+            okt = self.get_okt()
+            analyzed_batches = [MorphAnalyzer._pos_batch(okt, batch) for batch in batches]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=MorphAnalyzer._init_worker) as executor:
+                analyzed_batches = list(executor.map(MorphAnalyzer._pos_batch_in_worker, batches, chunksize=4))
+
+        return [pos for analyzed in analyzed_batches for pos in analyzed]
+
+    @staticmethod
+    def _init_worker():
+        from konlpy.tag import Okt
+        MorphAnalyzer.worker_okt = Okt()
+
+    @staticmethod
+    def _pos_batch_in_worker(texts):
+        return MorphAnalyzer._pos_batch(MorphAnalyzer.worker_okt, texts)
+
+    # One JVM call for the whole batch: the texts are joined around a sentinel token and split apart again
+    # Falls back to one call per text when a text contains the sentinel or the split does not line up
+    @staticmethod
+    def _pos_batch(okt, texts):
+        if len(texts) == 1 or any(MorphAnalyzer.SENTINEL in text for text in texts):
+            return [okt.pos(text) for text in texts]
+
+        results = [[]]
+        for morph, tag in okt.pos(MorphAnalyzer.SEPARATOR.join(texts)):
+            if morph == MorphAnalyzer.SENTINEL:
+                results.append([])
+            else:
+                results[-1].append((morph, tag))
+
+        if len(results) != len(texts):
+            return [okt.pos(text) for text in texts]
+        return results
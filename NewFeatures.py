@@ -1,27 +1,25 @@
 import os
 from tkinter import filedialog
 import pandas as pd
-from konlpy.tag import Okt
 import seaborn as sns
+from TermFrequency import TermFrequency
 
 FILE_TYPES = [("Excel files", "*.xlsx *.xls")]
 
-def extract_nouns(opinion):
-    return okt.nouns(str(opinion))
+# The morphological analyzer may start worker processes, which import this module again
+if __name__ == "__main__":
+    target_file = filedialog.askopenfilename(filetypes=FILE_TYPES)
+    file_name = os.path.basename(target_file)
+    df = pd.read_excel(target_file, engine='openpyxl')
 
-def most_frequent(noun_list):
-    return max(set(noun_list), key = noun_list.count) if noun_list else None
+    df = df[df['eval'].notna()]
 
-okt = Okt()
-target_file = filedialog.askopenfilename(filetypes=FILE_TYPES)
-file_name = os.path.basename(target_file)
-df = pd.read_excel(target_file, engine='openpyxl')
+    # Adds the nouns and frequent_noun columns (batched noun extraction, linear-time counting)
+    df, counts = TermFrequency.analyze_frame(df, 'eval')
+    summary = TermFrequency.top_terms(counts['frequent_nouns'], k=len(counts['frequent_nouns']))
+    sns.barplot(x=summary.index, y=summary.values)
 
-df = df[df['eval'].notna()]
-df['nouns'] = df['eval'].apply(extract_nouns)
+    df.to_excel(f"Converted_{file_name}", index=False, engine='openpyxl')
 
-df['frequent_noun'] = df['nouns'].apply(most_frequent)
-summary = df['frequent_noun'].value_counts()
-sns.barplot(x=summary.index, y=summary.values)
-
-df.to_excel(f"Converted_{file_name}", index=False, engine='openpyxl')
\ No newline at end of file
+    # For workbooks that do not fit in memory:
+    # TermFrequency.analyze_workbook(target_file, 'eval', output_file=f"Converted_{os.path.splitext(file_name)[0]}.csv")
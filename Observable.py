@@ -1,15 +1,20 @@
 import inspect
+import itertools
+import threading
 
 class Observable:
     def __init__(self):
         self._observer = None
+        self._events = {}  # pending events in posting order, {key: (event, kwargs)}
+        self._events_lock = threading.Lock()
+        self._event_ids = itertools.count()
 
     def attach(self, observer):
         if self._observer is None:
             self._observer = observer
         else:
             print(f"{inspect.currentframe().f_code.co_name}: Already attached to an observer.")
-           
+
     def detach(self):
         if self._observer:
             self._observer = None
@@ -19,3 +24,20 @@ class Observable:
     def notify(self, *args, **kwargs):
         response = self._observer.update(*args, **kwargs)
         return response if response else None
+
+    # Queue an event from any thread without calling the observer; drain() delivers it later
+    # A pending event with the same name is replaced (only the latest progress value matters),
+    # unless coalesce is False (e.g. error messages, which must all be shown)
+    def post(self, event, coalesce=True, **kwargs):
+        key = event if coalesce else (event, next(self._event_ids))
+        with self._events_lock:
+            self._events.pop(key, None)
+            self._events[key] = (event, kwargs)
+
+    # Deliver the pending events to the observer in one batch; call it from the observer's (UI) thread
+    def drain(self):
+        with self._events_lock:
+            events, self._events = self._events, {}
+        for event, kwargs in events.values():
+            self.notify(event, **kwargs)
+        return len(events)
@@ -0,0 +1,121 @@
+import time
+import random
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class TokenBucket:
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = capacity_per_minute
+        self.rate = capacity_per_minute / 60.0 if capacity_per_minute else 0.0
+        self.tokens = capacity_per_minute or 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Take cost units from the bucket and return how long the caller has to wait before using them
+    # The balance may go negative, so concurrent callers queue up behind each other instead of racing
+    def reserve(self, cost):
+        if not self.capacity:
+            return 0.0
+
+        cost = min(cost, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    # Empty the bucket, e.g. when the server answered 429 although we thought there was room
+    def drain(self):
+        if not self.capacity:
+            return
+        with self.lock:
+            self.tokens = min(self.tokens, 0)
+
+class RequestScheduler:
+
+    # Constants
+    MAX_WORKERS = 16
+    REQUESTS_PER_MINUTE = 3500
+    TOKENS_PER_MINUTE = 90000
+    MAX_RETRIES = 8
+    BASE_DELAY = 1.0  # seconds
+    MAX_DELAY = 60.0  # seconds
+    RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+    RETRYABLE_ERRORS = ('RateLimitError', 'Timeout', 'APIConnectionError', 'ServiceUnavailableError', 'TryAgain',
+                        'TimeoutError', 'ClientConnectionError', 'ClientConnectorError', 'ClientOSError',
+                        'ServerDisconnectedError', 'ServerTimeoutError')
+
+    def __init__(self, max_workers=None, requests_per_minute=None, tokens_per_minute=None, max_retries=None):
+        self.max_workers = max_workers or RequestScheduler.MAX_WORKERS
+        self.max_retries = RequestScheduler.MAX_RETRIES if max_retries is None else max_retries
+        self.request_bucket = TokenBucket(requests_per_minute or RequestScheduler.REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(tokens_per_minute or RequestScheduler.TOKENS_PER_MINUTE)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gpt-worker")
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    # Run func on the bounded worker pool
+    def submit(self, func, *args, **kwargs):
+        return self.executor.submit(func, *args, **kwargs)
+
+    # Call func (one API request worth cost tokens) within the rate limits, retrying transient errors
+    def call(self, func, cost, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.acquire(cost)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not RequestScheduler.is_retryable(e):
+                    raise
+                time.sleep(self.get_retry_delay(e, attempt))
+
+    # Book a retry of a failed request and return how long to back off before it
+    def get_retry_delay(self, error, attempt):
+        if RequestScheduler.get_status(error) == 429:
+            self.request_bucket.drain()
+            self.token_bucket.drain()
+        delay = RequestScheduler.get_backoff_delay(attempt, RequestScheduler.get_retry_after(error))
+        with self.lock:
+            self.retries += 1
+        print(f"{inspect.currentframe().f_code.co_name}: {type(error).__name__} (attempt {attempt + 1}), retrying in {delay:.1f}s")
+        return delay
+
+    def acquire(self, cost):
+        delay = self.get_acquire_delay(cost)
+        if delay > 0:
+            time.sleep(delay)
+
+    # Reserve one request and cost tokens; the async backend awaits the returned delay instead of sleeping
+    def get_acquire_delay(self, cost):
+        return max(self.request_bucket.reserve(1), self.token_bucket.reserve(cost))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    # Exponential backoff with full jitter, never shorter than the server's Retry-After
+    @staticmethod
+    def get_backoff_delay(attempt, retry_after=None):
+        delay = random.uniform(0, min(RequestScheduler.MAX_DELAY, RequestScheduler.BASE_DELAY * 2 ** attempt))
+        return max(delay, retry_after) if retry_after else delay
+
+    @staticmethod
+    def get_status(error):
+        return getattr(error, 'http_status', None) or getattr(error, 'status', None)
+
+    @staticmethod
+    def get_retry_after(error):
+        headers = getattr(error, 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after') or headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    # Errors are matched by status and class name so that both the openai client and aiohttp are covered
+    @staticmethod
+    def is_retryable(error):
+        if RequestScheduler.get_status(error) in RequestScheduler.RETRYABLE_STATUS:
+            return True
+        return type(error).__name__ in RequestScheduler.RETRYABLE_ERRORS
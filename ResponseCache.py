@@ -0,0 +1,176 @@
+import os
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+
+class ResponseCache:
+
+    # Constants
+    MAX_BYTES = 512 * 1024 * 1024  # size cap of the stored rows
+    EVICTION_TARGET = 0.9  # evict down to this fraction of the cap, so eviction does not run on every flush
+    WRITE_BATCH_SIZE = 500  # pending rows that trigger a flush
+    QUERY_BATCH_SIZE = 500  # keys per SELECT (stays below SQLite's variable limit)
+
+    def __init__(self, db_path, max_bytes=None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes or ResponseCache.MAX_BYTES
+        self.local = threading.local()
+        self.lock = threading.Lock()  # guards the pending writes and serializes the writers
+        self.pending = {}
+        self.pending_touches = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = None  # running total of the stored rows' sizes, summed once on the first flush
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._get_connection()
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, gpt_message TEXT, content TEXT, value TEXT, size INTEGER, last_access REAL,
+                model TEXT, prompt_hash TEXT);
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+        """)
+        # Databases written before the model and prompt were stored get the columns (their rows keep NULLs)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(responses)")}
+        for column in ("model", "prompt_hash"):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_prompt ON responses (model, prompt_hash, gpt_message)")
+        connection.commit()
+
+        # Rows buffered by the workers must not be lost when the program exits
+        atexit.register(self.flush)
+
+    # Rows are addressed by what was actually sent: the model, the prompt text and the row content
+    # (not the row index), so renumbered, reordered or re-chunked rows still hit the cache
+    @staticmethod
+    def get_key(model, prompt, content):
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (model, prompt, content):
+            digest.update(part.encode())
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    # Stored with every row, so that rows can be selected by the prompt text they were answered for
+    @staticmethod
+    def get_prompt_hash(prompt):
+        return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+    # Return {key: entry} for the keys found in the cache
+    def get_many(self, keys):
+        keys = list(keys)
+        entries = {}
+
+        # Rows that are buffered but not flushed yet are visible as well
+        with self.lock:
+            for key in keys:
+                if key in self.pending:
+                    entries[key] = self.pending[key]
+
+        remaining = [key for key in keys if key not in entries]
+        connection = self._get_connection()
+        for start in range(0, len(remaining), ResponseCache.QUERY_BATCH_SIZE):
+            batch = remaining[start:start + ResponseCache.QUERY_BATCH_SIZE]
+            rows = connection.execute(
+                f"SELECT key, gpt_message, content, value FROM responses WHERE key IN ({','.join('?' * len(batch))})", batch)
+            for key, gpt_message, content, value in rows:
+                entries[key] = {"gpt_message": gpt_message, "content": content, "value": value}
+
+        with self.lock:
+            self.hits += len(entries)
+            self.misses += len(keys) - len(entries)
+            self.pending_touches.update(key for key in entries if key not in self.pending)
+
+        return entries
+
+    # entries: {key: {"model": ..., "prompt_hash": ..., "gpt_message": ..., "content": ..., "value": ...}}
+    # Writes are buffered and flushed in batches, so worker threads rarely wait on the database
+    def put_many(self, entries):
+        with self.lock:
+            self.pending.update(entries)
+            should_flush = len(self.pending) >= ResponseCache.WRITE_BATCH_SIZE
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending and not self.pending_touches:
+                return
+
+            now = time.time()
+            connection = self._get_connection()
+            if self.size is None:
+                self.size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+            # Replaced rows only count with their new size
+            keys = list(self.pending)
+            for start in range(0, len(keys), ResponseCache.QUERY_BATCH_SIZE):
+                batch = keys[start:start + ResponseCache.QUERY_BATCH_SIZE]
+                self.size -= connection.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM responses WHERE key IN ({','.join('?' * len(batch))})", batch).fetchone()[0]
+            self.size += sum(ResponseCache._get_size(key, entry) for key, entry in self.pending.items())
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO responses (key, gpt_message, content, value, size, last_access, model, prompt_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key, entry["gpt_message"], entry["content"], entry["value"], ResponseCache._get_size(key, entry), now,
+                  entry.get("model"), entry.get("prompt_hash"))
+                 for key, entry in self.pending.items()])
+            connection.executemany("UPDATE responses SET last_access = ? WHERE key = ?", [(now, key) for key in self.pending_touches])
+            self._evict(connection)
+            connection.commit()
+
+            self.pending = {}
+            self.pending_touches = set()
+
+    def get_stats(self):
+        self.flush()
+        entries, size = self._get_connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    # (content, value) of the rows answered by one model for one prompt, most recently used first (e.g. to train a local model)
+    # Selected by every component of the cache key, so answers to an edited prompt or another model are never mixed in
+    def get_entries(self, model, gpt_message, prompt, limit=None):
+        self.flush()
+        return self._get_connection().execute(
+            "SELECT content, value FROM responses WHERE model = ? AND prompt_hash = ? AND gpt_message = ? ORDER BY last_access DESC LIMIT ?",
+            (model, ResponseCache.get_prompt_hash(prompt), gpt_message, -1 if limit is None else limit)).fetchall()
+
+    # Private methods
+
+    # One connection per thread; in WAL mode readers never block each other or the writer
+    def _get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    # Drop the least recently used rows once the cap is exceeded (called with the lock held)
+    # Only the running total is checked, so a flush below the cap does not scan the table
+    def _evict(self, connection):
+        if self.size <= self.max_bytes:
+            return
+
+        excess = self.size - self.max_bytes * ResponseCache.EVICTION_TARGET
+        evicted = connection.execute("""
+            SELECT key, size FROM (SELECT key, size, SUM(size) OVER (ORDER BY last_access, key) AS freed FROM responses)
+            WHERE freed - size < ?
+        """, (excess,)).fetchall()
+        connection.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in evicted])
+        self.size -= sum(size for _, size in evicted)
+        self.evictions += len(evicted)
+
+    @staticmethod
+    def _get_size(key, entry):
+        return len(key) + sum(len(str(entry[name]).encode()) for name in ("gpt_message", "content", "value"))
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import SystemMessages
+from WorkbookCache import WorkbookCache
+
+class RunCheckpoint:
+
+    # Constants
+    RUNS_DIR = "runs"
+
+    # A run is identified by the input contents, the prompt and the columns involved, so re-running
+    # the same classification on the same workbook resumes it
+    def __init__(self, excel_file, gpt_message, target_column, standard_column, new_column_name):
+        fingerprint = WorkbookCache.fingerprint(excel_file)
+        prompt = "\n".join(SystemMessages.ALL_MESSAGES[gpt_message])
+        self.run_id = hashlib.blake2b("\x1f".join([fingerprint, prompt, str(target_column), str(standard_column), str(new_column_name)]).encode(),
+                                      digest_size=12).hexdigest()
+        self.run_dir = os.path.join(RunCheckpoint.RUNS_DIR, self.run_id)
+        self.manifest_path = os.path.join(self.run_dir, "manifest.json")
+        self.rows_path = os.path.join(self.run_dir, "rows.jsonl")
+        self.lock = threading.Lock()
+        self.values = {}
+
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+        # A finished run is started over; an unfinished one is resumed from its recorded rows
+        if self.manifest is None or self.manifest.get("status") == "complete":
+            self.manifest = {
+                "run_id": self.run_id, "input_file": os.path.abspath(excel_file), "input_fingerprint": fingerprint,
+                "gpt_message": gpt_message, "prompt": prompt, "target_column": target_column, "standard_column": standard_column,
+                "new_column_name": new_column_name, "status": "running", "created": time.time(),
+            }
+            if os.path.exists(self.rows_path):
+                os.remove(self.rows_path)
+        else:
+            self.values = self._read_rows()
+            print(f"Resuming run {self.run_id}: {len(self.values)} rows already done")
+
+        self._write_manifest()
+        self.rows_file = open(self.rows_path, 'a', encoding='utf-8')
+
+    def is_done(self, idx):
+        return RunCheckpoint._to_json_key(idx) in self.values
+
+    # Values recorded so far ({idx: value}); safe to call while workers are recording
+    def get_values(self):
+        with self.lock:
+            return dict(self.values)
+
+    # Durably append finished rows ({idx: value}); called from the worker threads
+    def record(self, values):
+        if not values:
+            return
+        rows = [[RunCheckpoint._to_json_key(idx), value] for idx, value in values.items()]
+        with self.lock:
+            self.rows_file.write(json.dumps(rows, ensure_ascii=False) + "\n")
+            self.rows_file.flush()
+            os.fsync(self.rows_file.fileno())
+            self.values.update(rows)
+
+    # A run that left rows unresolved is marked incomplete, so the next run resumes it and only asks for those rows
+    def complete(self, unresolved_rows=0):
+        with self.lock:
+            self.rows_file.close()
+            self.manifest["status"] = "incomplete" if unresolved_rows else "complete"
+            self.manifest["unresolved_rows"] = unresolved_rows
+            self._write_manifest()
+
+    # Private methods
+
+    @staticmethod
+    def _to_json_key(idx):
+        # numpy scalars (e.g. from a DataFrame column) are not JSON serializable
+        return idx.item() if hasattr(idx, "item") else idx
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        self.manifest["updated"] = time.time()
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _read_rows(self):
+        values = {}
+        if not os.path.exists(self.rows_path):
+            return values
+        with open(self.rows_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    values.update((idx, value) for idx, value in json.loads(line))
+                except ValueError:
+                    # The last line may be cut short by a crash
+                    continue
+        return values
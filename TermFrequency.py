@@ -0,0 +1,79 @@
+import os
+from itertools import chain
+from collections import Counter
+import pandas as pd
+from WorkbookLoader import WorkbookLoader
+from MorphAnalyzer import MorphAnalyzer
+
+class TermFrequency:
+
+    # Constants
+    TOP_K = 10
+    COUNT_NAMES = ("nouns", "frequent_nouns")
+
+    # The k most frequent terms of every row (ties keep their first occurrence order), in linear time
+    @staticmethod
+    def top_terms_per_row(term_lists, k=1):
+        return [[term for term, _ in Counter(terms).most_common(k)] for terms in term_lists]
+
+    @staticmethod
+    def count_terms(term_lists):
+        return Counter(chain.from_iterable(term_lists))
+
+    # Partial counts ({name: Counter}) of separate batches add up to the counts of the whole input
+    @staticmethod
+    def merge_counts(partial_counts):
+        totals = {name: Counter() for name in TermFrequency.COUNT_NAMES}
+        for counts in partial_counts:
+            for name, counter in counts.items():
+                totals[name].update(counter)
+        return totals
+
+    # The k most frequent terms of a Counter as a Series (term -> count), like value_counts()
+    @staticmethod
+    def top_terms(counter, k=None):
+        terms = counter.most_common(k or TermFrequency.TOP_K)
+        return pd.Series([count for _, count in terms], index=[term for term, _ in terms], name='count', dtype='int64')
+
+    # Add the nouns of text_column next to the source rows:
+    #   nouns: every noun of the row, frequent_noun: its most frequent noun, top_nouns: its k most frequent nouns (k > 1)
+    # Returns the new frame and its partial counts {"nouns": Counter, "frequent_nouns": Counter}
+    @staticmethod
+    def analyze_frame(df, text_column, k=1, analyzer=None):
+        analyzer = analyzer or MorphAnalyzer()
+
+        # Empty cells get no nouns
+        has_text = df[text_column].notna().to_numpy()
+        extracted = iter(analyzer.nouns_many(df.loc[has_text, text_column].astype(str).tolist()))
+        noun_lists = [next(extracted) if row_has_text else [] for row_has_text in has_text]
+
+        top_nouns = TermFrequency.top_terms_per_row(noun_lists, k)
+        frequent_nouns = [terms[0] if terms else None for terms in top_nouns]
+        df = df.assign(nouns=noun_lists, frequent_noun=frequent_nouns)
+        if k > 1:
+            df['top_nouns'] = [", ".join(terms) for terms in top_nouns]
+
+        counts = {"nouns": TermFrequency.count_terms(noun_lists),
+                  "frequent_nouns": Counter(noun for noun in frequent_nouns if noun is not None)}
+        return df, counts
+
+    # Stream a workbook that may not fit in memory batch by batch, merging the partial counts as it goes
+    # output_file: if given, the analyzed rows are appended to this CSV file batch by batch
+    @staticmethod
+    def analyze_workbook(excel_file, text_column, k=1, output_file=None, batch_size=None, analyzer=None):
+        analyzer = analyzer or MorphAnalyzer()
+        totals = TermFrequency.merge_counts([])
+        rows = 0
+
+        for batch in WorkbookLoader.iter_excel_batches(excel_file, batch_size=batch_size):
+            batch, counts = TermFrequency.analyze_frame(batch, text_column, k, analyzer)
+            totals = TermFrequency.merge_counts([totals, counts])
+
+            if output_file:
+                # The BOM of the first batch lets Excel detect UTF-8 (Korean text); later batches are appended
+                batch.to_csv(output_file, index=False, mode='w' if rows == 0 else 'a', header=rows == 0,
+                             encoding='utf-8-sig' if rows == 0 else 'utf-8')
+            rows += len(batch)
+
+        print(f"Counted {sum(totals['nouns'].values())} nouns in {rows} rows of {os.path.basename(excel_file)}")
+        return totals
@@ -0,0 +1,174 @@
+import re
+import zlib
+import unicodedata
+import numpy as np
+
+class TextDeduplicator:
+
+    # Constants
+    PUNCTUATION = re.compile(r"[^\w\s]")  # \w covers Hangul, so only symbols are removed
+    WHITESPACE = re.compile(r"\s+")
+
+    # Near-duplicate clustering (MinHash/LSH)
+    THRESHOLD = 0.85  # short answers one character apart ("만족"/"불만족") have a Jaccard similarity of only 0.5
+    SHINGLE_SIZE = 2  # character n-grams; short Korean answers need small shingles
+    MIN_LENGTH_RATIO = 0.8  # shorter / longer normalized text
+    NEGATION_MARKERS = ("안", "않", "못", "없", "불", "아니", "not", "no")  # texts are only merged when every marker occurs equally often
+    NUM_PERM = 64
+    SIGNATURE_BLOCK_ROWS = 10000
+    PRIME = (1 << 31) - 1
+    SEED = 42
+
+    # Fold full-width/half-width forms (NFKC), drop punctuation, collapse whitespace and case
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize("NFKC", str(text))
+        text = TextDeduplicator.PUNCTUATION.sub(" ", text)
+        return TextDeduplicator.WHITESPACE.sub(" ", text).strip().lower()
+
+    # Group data tuples (idx, target[, eval]) whose normalized contents are identical
+    # Returns the first tuple of every group and {representative idx: [idx of every member]}
+    @staticmethod
+    def collapse(data_structs):
+        representatives = []
+        groups = {}
+        representative_by_key = {}
+
+        for data_tuple in data_structs:
+            key = tuple(TextDeduplicator.normalize(value) for value in data_tuple[1:])
+            representative = representative_by_key.get(key)
+            if representative is None:
+                representative_by_key[key] = data_tuple[0]
+                representatives.append(data_tuple)
+                groups[data_tuple[0]] = [data_tuple[0]]
+            else:
+                groups[representative].append(data_tuple[0])
+
+        return representatives, groups
+
+    # Fan the values of the representatives ({idx: value}) back out to every member of their group
+    @staticmethod
+    def expand(values, groups):
+        return {idx: value for representative, value in values.items() for idx in groups.get(representative, [representative])}
+
+    # Merge groups of representatives ({rep: [inner reps]}) with the groups of those representatives
+    @staticmethod
+    def merge_groups(outer_groups, inner_groups):
+        return {representative: [idx for member in members for idx in inner_groups.get(member, [member])]
+                for representative, members in outer_groups.items()}
+
+    # {idx: idx of the representative} for every member of every group
+    @staticmethod
+    def get_sources(groups):
+        return {idx: representative for representative, members in groups.items() for idx in members}
+
+    # Cluster near-identical texts with MinHash signatures and LSH banding (no pairwise comparison)
+    # Every member of a cluster has a Jaccard similarity >= threshold with its representative, a similar length and
+    # the same negations, and rows are only compared with the representatives that share one of their LSH buckets
+    # Returns the representatives and {representative idx: [idx of every member]} like collapse()
+    @staticmethod
+    def cluster_near_duplicates(data_structs, threshold=None):
+        threshold = threshold or TextDeduplicator.THRESHOLD
+
+        # Rows with a standard column are only clustered with rows of the same standard value
+        partitions = {}
+        for data_tuple in data_structs:
+            key = tuple(TextDeduplicator.normalize(value) for value in data_tuple[2:])
+            partitions.setdefault(key, []).append(data_tuple)
+
+        representatives = []
+        groups = {}
+        for partition in partitions.values():
+            texts = [TextDeduplicator.normalize(data_tuple[1]).replace(" ", "") for data_tuple in partition]
+            shingle_sets = [TextDeduplicator._get_shingles(text) for text in texts]
+            signatures = TextDeduplicator._get_signatures(shingle_sets)
+            for position, members in TextDeduplicator._cluster_signatures(signatures, shingle_sets, texts, threshold).items():
+                representatives.append(partition[position])
+                groups[partition[position][0]] = [partition[member][0] for member in members]
+
+        return representatives, groups
+
+    # Private methods
+
+    # text: normalized, without spaces
+    @staticmethod
+    def _get_shingles(text):
+        if len(text) <= TextDeduplicator.SHINGLE_SIZE:
+            return {zlib.crc32(text.encode())} if text else set()
+        return {zlib.crc32(text[i:i + TextDeduplicator.SHINGLE_SIZE].encode()) for i in range(len(text) - TextDeduplicator.SHINGLE_SIZE + 1)}
+
+    # MinHash signatures of shape (rows, NUM_PERM), computed block by block with universal hashing
+    @staticmethod
+    def _get_signatures(shingle_sets):
+        prime = np.uint64(TextDeduplicator.PRIME)
+        random_state = np.random.RandomState(TextDeduplicator.SEED)
+        a = random_state.randint(1, TextDeduplicator.PRIME, size=TextDeduplicator.NUM_PERM).astype(np.uint64)
+        b = random_state.randint(0, TextDeduplicator.PRIME, size=TextDeduplicator.NUM_PERM).astype(np.uint64)
+
+        signatures = np.full((len(shingle_sets), TextDeduplicator.NUM_PERM), TextDeduplicator.PRIME, dtype=np.uint64)
+        for start in range(0, len(shingle_sets), TextDeduplicator.SIGNATURE_BLOCK_ROWS):
+            block = shingle_sets[start:start + TextDeduplicator.SIGNATURE_BLOCK_ROWS]
+            rows = np.array([position for position, shingles in enumerate(block) if shingles], dtype=np.int64)
+            if rows.size == 0:
+                continue
+
+            hashes = np.fromiter((shingle for shingles in block for shingle in shingles), dtype=np.uint64) % prime
+            lengths = np.array([len(block[row]) for row in rows], dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+            # (a * h + b) mod p stays below 2^63, so uint64 arithmetic does not overflow
+            values = (hashes[:, None] * a + b) % prime
+            signatures[start + rows] = np.minimum.reduceat(values, offsets, axis=0)
+
+        return signatures
+
+    # Pick the LSH band layout whose S-curve threshold (1/bands)^(1/rows) is closest to the similarity threshold
+    @staticmethod
+    def _get_band_layout(threshold):
+        layouts = [(bands, TextDeduplicator.NUM_PERM // bands) for bands in range(1, TextDeduplicator.NUM_PERM + 1)
+                   if TextDeduplicator.NUM_PERM % bands == 0]
+        return min(layouts, key=lambda layout: abs((1 / layout[0]) ** (1 / layout[1]) - threshold))
+
+    # Greedy leader clustering over LSH buckets: returns {representative position: [member positions]}
+    @staticmethod
+    def _cluster_signatures(signatures, shingle_sets, texts, threshold):
+        bands, rows_per_band = TextDeduplicator._get_band_layout(threshold)
+        buckets = [{} for _ in range(bands)]
+        clusters = {}
+
+        # Hash every band of every signature to one integer at once (uint64 arithmetic wraps around)
+        multipliers = np.random.RandomState(TextDeduplicator.SEED + 1).randint(1, TextDeduplicator.PRIME, size=rows_per_band).astype(np.uint64)
+        all_band_keys = (signatures.reshape(len(signatures), bands, rows_per_band) * multipliers).sum(axis=2).tolist()
+        min_matches = threshold * TextDeduplicator.NUM_PERM
+
+        for position, band_keys in enumerate(all_band_keys):
+            if not shingle_sets[position]:
+                clusters[position] = [position]
+                continue
+
+            signature = signatures[position]
+            representative = None
+            for band, band_key in enumerate(band_keys):
+                candidate = buckets[band].get(band_key)
+                if (candidate is not None and np.count_nonzero(signatures[candidate] == signature) >= min_matches
+                        and TextDeduplicator._is_near_duplicate(texts[candidate], texts[position], shingle_sets[candidate], shingle_sets[position], threshold)):
+                    representative = candidate
+                    break
+
+            if representative is None:
+                clusters[position] = [position]
+                for band, band_key in enumerate(band_keys):
+                    buckets[band].setdefault(band_key, position)
+            else:
+                clusters[representative].append(position)
+
+        return clusters
+
+    # Verify an LSH candidate exactly: the MinHash estimate alone merges short answers with opposite meanings
+    @staticmethod
+    def _is_near_duplicate(text, other_text, shingles, other_shingles, threshold):
+        if min(len(text), len(other_text)) < TextDeduplicator.MIN_LENGTH_RATIO * max(len(text), len(other_text)):
+            return False
+        if any(text.count(marker) != other_text.count(marker) for marker in TextDeduplicator.NEGATION_MARKERS):
+            return False
+        return len(shingles & other_shingles) >= threshold * len(shingles | other_shingles)
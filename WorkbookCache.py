@@ -0,0 +1,127 @@
+import os
+import inspect
+import hashlib
+import threading
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it every open parses the workbook
+    feather = None
+
+class WorkbookCache:
+
+    # Constants
+    CACHE_DIR = "workbook_cache"
+    SAMPLE_SIZE = 1 << 20  # bytes hashed from the head, the middle and the tail of the file
+    MAX_BYTES = 2 * 1024 * 1024 * 1024  # size cap of the cache directory
+    EVICTION_TARGET = 0.8  # evict down to this fraction of the cap, so eviction does not run on every store
+    ENABLED = feather is not None
+
+    lock = threading.Lock()
+
+    # An .xlsx file is a zip archive whose central directory (at the end of the file) stores a
+    # CRC-32 for every member, so hashing the tail together with the size, the mtime and a few
+    # samples catches content changes without reading the whole file
+    @staticmethod
+    def fingerprint(excel_file):
+        stat = os.stat(excel_file)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{stat.st_size}|{stat.st_mtime_ns}".encode())
+
+        with open(excel_file, 'rb') as f:
+            offsets = [0, max(stat.st_size // 2 - WorkbookCache.SAMPLE_SIZE // 2, 0), max(stat.st_size - WorkbookCache.SAMPLE_SIZE, 0)]
+            for offset in sorted(set(offsets)):
+                f.seek(offset)
+                digest.update(f.read(WorkbookCache.SAMPLE_SIZE))
+
+        return digest.hexdigest()
+
+    # Return the cached sheet (projected to columns if given) or None on a miss
+    @staticmethod
+    def load(excel_file, columns=None):
+        if not WorkbookCache.ENABLED:
+            return None
+
+        try:
+            key = WorkbookCache.fingerprint(excel_file)
+            for path in WorkbookCache._candidate_paths(key, columns):
+                if os.path.exists(path):
+                    # Uncompressed Arrow IPC is memory-mapped, so only the projected columns are paged in
+                    table = feather.read_table(path, columns=columns, memory_map=True)
+                    os.utime(path)  # the modification time orders the entries for eviction
+                    return table.to_pandas()
+        except Exception as e:
+            print(f"{inspect.currentframe().f_code.co_name}: Ignoring the workbook cache for {excel_file}: {e}")
+        return None
+
+    @staticmethod
+    def store(excel_file, df, columns=None):
+        if not WorkbookCache.ENABLED:
+            return
+
+        try:
+            key = WorkbookCache.fingerprint(excel_file)
+            path = WorkbookCache._entry_path(key, columns)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+            with WorkbookCache.lock:
+                if not os.path.exists(WorkbookCache.CACHE_DIR):
+                    os.makedirs(WorkbookCache.CACHE_DIR, exist_ok=True)
+
+            # Arrow requires string column names (WorkbookLoader already gives every frame string names)
+            df = WorkbookCache.normalize_columns(df)
+            feather.write_feather(df, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+            WorkbookCache._evict(keep=path)
+        except Exception as e:
+            # Mixed-type object columns cannot always be converted to Arrow; just skip caching them
+            print(f"{inspect.currentframe().f_code.co_name}: Could not cache {excel_file}: {e}")
+            if 'tmp_path' in locals() and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # Column names as strings, the way a cache hit returns them
+    @staticmethod
+    def normalize_columns(df):
+        return df.rename(columns=str) if not all(isinstance(col, str) for col in df.columns) else df
+
+    # Private methods
+
+    # Drop the least recently used entries once the directory exceeds the cap
+    @staticmethod
+    def _evict(keep=None):
+        with WorkbookCache.lock:
+            entries = []
+            for entry in os.scandir(WorkbookCache.CACHE_DIR):
+                if entry.name.endswith(".arrow") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            size = sum(entry_size for _, entry_size, _ in entries)
+            if size <= WorkbookCache.MAX_BYTES:
+                return
+
+            for _, entry_size, path in sorted(entries):
+                if size <= WorkbookCache.MAX_BYTES * WorkbookCache.EVICTION_TARGET:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    size -= entry_size
+                except OSError:
+                    pass  # removed by another process, or still mapped on Windows
+
+    @staticmethod
+    def _entry_path(key, columns=None):
+        if columns is None:
+            return os.path.join(WorkbookCache.CACHE_DIR, f"{key}.arrow")
+        columns_key = hashlib.blake2b("\x1f".join(map(str, columns)).encode(), digest_size=8).hexdigest()
+        return os.path.join(WorkbookCache.CACHE_DIR, f"{key}-{columns_key}.arrow")
+
+    @staticmethod
+    def _candidate_paths(key, columns=None):
+        # A full-sheet entry can serve any projection
+        paths = [WorkbookCache._entry_path(key)]
+        if columns is not None:
+            paths.append(WorkbookCache._entry_path(key, columns))
+        return paths
@@ -0,0 +1,158 @@
+import os
+import inspect
+import operator
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from WorkbookCache import WorkbookCache
+
+class WorkbookLoader:
+
+    # Constants
+    BATCH_SIZE = 50000  # rows per DataFrame batch in streaming mode
+
+    @staticmethod
+    def read_header(excel_file):
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(max_row=1, values_only=True)
+            header = next(rows, None)
+            return WorkbookLoader._normalize_header(header) if header else []
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def read_excel(excel_file, columns=None, streaming=False, batch_size=None, use_cache=True):
+        # An unchanged workbook is served from the columnar sidecar cache without parsing any XML
+        if use_cache:
+            df = WorkbookCache.load(excel_file, columns)
+            if df is not None:
+                return df
+
+        # Column names are strings on every path (a number in the header would otherwise differ between a cold and a warm open)
+        df = WorkbookCache.normalize_columns(WorkbookLoader._parse_excel(excel_file, columns, streaming, batch_size))
+        if use_cache:
+            WorkbookCache.store(excel_file, df, columns)
+        return df
+
+    # Read several workbooks and concatenate them in one pass (input order is kept)
+    # source_column: if given, tag every row with the name of the file it came from
+    @staticmethod
+    def read_many(excel_files, columns=None, source_column=None, max_workers=None):
+        excel_files = list(excel_files)
+        if not excel_files:
+            return pd.DataFrame(columns=columns)
+
+        # openpyxl parsing is CPU-bound, so spread the files over processes; map() preserves the order
+        # The workers are spawned, not forked: a forked copy of the app's (or the batch CLI's) threads can hang on a held lock
+        if len(excel_files) == 1 or max_workers == 1:
+            frames = [WorkbookLoader.read_excel(excel_file, columns) for excel_file in excel_files]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                frames = list(executor.map(WorkbookLoader.read_excel, excel_files, [columns] * len(excel_files)))
+
+        if source_column:
+            for frame, excel_file in zip(frames, excel_files):
+                frame.insert(0, source_column, os.path.splitext(os.path.basename(excel_file))[0])
+
+        return pd.concat(WorkbookLoader._align_frames(frames), ignore_index=True)
+
+    # Stream the first sheet through openpyxl's read-only iterator and yield DataFrames of
+    # at most batch_size rows, keeping only the requested columns (all columns if None)
+    # Blank rows are kept like pd.read_excel keeps them (as all-missing rows), except at the end of the sheet
+    @staticmethod
+    def iter_excel_batches(excel_file, columns=None, batch_size=None):
+        batch_size = batch_size or WorkbookLoader.BATCH_SIZE
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+
+            header = WorkbookLoader._normalize_header(header)
+            positions = WorkbookLoader._resolve_positions(header, columns)
+            names = [header[position] for position in positions]
+            width = len(header)
+
+            # itemgetter with a single position returns a scalar, not a tuple
+            if len(positions) == 1:
+                position = positions[0]
+                project = lambda row: (row[position],)
+            else:
+                project = operator.itemgetter(*positions)
+
+            batch = []
+            blank_rows = 0
+            blank_row = (None,) * len(positions)
+            for row in rows:
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                # Blank rows are only written once a non-blank row follows them (trailing formatted rows are dropped)
+                if all(value is None for value in row):
+                    blank_rows += 1
+                    continue
+                batch.extend([blank_row] * blank_rows)
+                blank_rows = 0
+                batch.append(project(row))
+                if len(batch) >= batch_size:
+                    yield pd.DataFrame.from_records(batch, columns=names)
+                    batch = []
+
+            if batch:
+                yield pd.DataFrame.from_records(batch, columns=names)
+        finally:
+            workbook.close()
+
+    # Private methods
+
+    @staticmethod
+    def _parse_excel(excel_file, columns=None, streaming=False, batch_size=None):
+        # The default path is unchanged: parse the whole first sheet with pandas
+        # usecols keeps the sheet's order, so the columns are put in the requested order like the cache and streaming give them
+        if not streaming:
+            df = pd.read_excel(excel_file, engine='openpyxl', usecols=columns)
+            return df[list(columns)] if columns is not None else df
+
+        batches = list(WorkbookLoader.iter_excel_batches(excel_file, columns, batch_size))
+        if not batches:
+            return pd.DataFrame(columns=columns)
+        if len(batches) == 1:
+            return batches[0]
+        return pd.concat(batches, ignore_index=True)
+
+    # Give every frame the same columns (in first-seen order) and the same dtype per column
+    @staticmethod
+    def _align_frames(frames):
+        columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+
+        casts = {}
+        for column in columns:
+            dtypes = {frame[column].dtype for frame in frames if column in frame.columns}
+            # Numeric columns are upcast by concat itself; anything else that disagrees becomes object
+            if len(dtypes) > 1 and not all(pd.api.types.is_numeric_dtype(dtype) for dtype in dtypes):
+                casts[column] = object
+
+        aligned = []
+        for frame in frames:
+            if list(frame.columns) != columns:
+                frame = frame.reindex(columns=columns)
+            frame_casts = {column: dtype for column, dtype in casts.items() if frame[column].dtype != dtype}
+            aligned.append(frame.astype(frame_casts) if frame_casts else frame)
+        return aligned
+
+    @staticmethod
+    def _normalize_header(header):
+        # Mirror pandas' naming of empty header cells
+        return [name if name is not None else f"Unnamed: {position}" for position, name in enumerate(header)]
+
+    @staticmethod
+    def _resolve_positions(header, columns):
+        if columns is None:
+            return list(range(len(header)))
+
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Columns {missing} not found in the sheet header.")
+        return [header.index(column) for column in columns]
@@ -0,0 +1,130 @@
+import os
+import re
+import inspect
+import threading
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter is optional; without it xlsx files are written through openpyxl (slower, whole sheet in memory)
+    xlsxwriter = None
+
+class WorkbookWriter:
+
+    # Constants
+    FORMATS = ('xlsx', 'csv', 'parquet')
+    MAX_XLSX_ROWS = 1048576  # including the header row
+    XLSX_OPTIONS = {
+        'constant_memory': True,  # rows are flushed to disk as they are written
+        'strings_to_formulas': False,  # free-text answers are data, even when they start with '='
+        'strings_to_urls': False,
+        'strings_to_numbers': False,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    }
+
+    # Write a DataFrame as xlsx, csv or parquet (inferred from the file extension if not given)
+    # The file is written under a temporary name and renamed when complete, so a failed write never replaces a good file
+    @staticmethod
+    def write_frame(df, file_name, output_format=None):
+        output_format = (output_format or os.path.splitext(file_name)[1].lstrip('.')).lower()
+        if output_format not in WorkbookWriter.FORMATS:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Unsupported output format '{output_format}' (expected one of {WorkbookWriter.FORMATS}).")
+
+        # Unique per process and thread, in the same directory so that the rename is atomic
+        tmp_path = os.path.join(os.path.dirname(os.path.abspath(file_name)), f".{os.path.basename(file_name)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if output_format == 'xlsx':
+                WorkbookWriter._write_xlsx(df, tmp_path)
+            elif output_format == 'csv':
+                # utf-8-sig so that Excel detects the encoding of Korean text
+                df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+            else:
+                df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, file_name)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return file_name
+
+    # Write every (df, file_stem) pair in every output format at the same time, e.g. "Combined(a.xlsx)" -> "Combined(a.xlsx).csv"
+    # Threads, not processes: this runs on the app's worker thread, and a process would need its own copy of every frame
+    @staticmethod
+    def write_frames(frames, output_formats=('xlsx',), max_workers=None):
+        unsupported = [output_format for output_format in output_formats if output_format not in WorkbookWriter.FORMATS]
+        if unsupported or not output_formats:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Unsupported output format {unsupported} (expected one of {WorkbookWriter.FORMATS}).")
+
+        jobs = [(df, f"{file_stem}.{output_format}", output_format) for df, file_stem in frames for output_format in output_formats]
+        if len(jobs) == 1:
+            return [WorkbookWriter.write_frame(*jobs[0])]
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor:
+            return list(executor.map(WorkbookWriter.write_frame, *zip(*jobs)))
+
+    # Split df by key_column in a single groupby pass and write one file per key
+    # Rows without a key go to prefix_NA; keys that map to the same file name get a numbered suffix
+    @staticmethod
+    def write_partitions(df, key_column, output_format='xlsx', output_dir='.', prefix='data', max_workers=None):
+        if key_column not in df.columns:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Column '{key_column}' not found.")
+        if output_format not in WorkbookWriter.FORMATS:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: Unsupported output format '{output_format}' (expected one of {WorkbookWriter.FORMATS}).")
+
+        partitions = []
+        file_names = []
+        used_names = set()
+        for key, partition in df.groupby(key_column, sort=False, dropna=False):
+            name = "NA" if pd.isna(key) else WorkbookWriter._safe_file_name(key)
+            # e.g. "a/b" and "a:b"; compared case-insensitively for Windows and macOS file systems
+            unique_name, suffix = name, 2
+            while unique_name.lower() in used_names:
+                unique_name, suffix = f"{name}_{suffix}", suffix + 1
+            used_names.add(unique_name.lower())
+            partitions.append(partition)
+            file_names.append(os.path.join(output_dir, f"{prefix}_{unique_name}.{output_format}"))
+
+        if not partitions:
+            return []
+
+        # xlsx serialization is pure Python and needs processes; csv/parquet writers release the GIL
+        # Every partition is pickled to its worker (a copy of the data in flight), and the workers are spawned, not forked:
+        # a forked copy of the app's (or the batch CLI's) threads can hang on a held lock
+        if output_format == 'xlsx':
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        with executor:
+            return list(executor.map(WorkbookWriter.write_frame, partitions, file_names, [output_format] * len(partitions)))
+
+    # Private methods
+
+    # Stream the rows into the sheet one by one (pandas' xlsxwriter path writes column by column and cannot use constant_memory)
+    @staticmethod
+    def _write_xlsx(df, file_name):
+        if len(df) >= WorkbookWriter.MAX_XLSX_ROWS:
+            raise ValueError(f"{inspect.currentframe().f_code.co_name}: {len(df)} rows do not fit in an xlsx sheet; write csv or parquet instead.")
+        if xlsxwriter is None:
+            df.to_excel(file_name, index=False, engine='openpyxl')
+            return
+
+        workbook = xlsxwriter.Workbook(file_name, WorkbookWriter.XLSX_OPTIONS)
+        try:
+            worksheet = workbook.add_worksheet()
+            worksheet.write_row(0, 0, [str(column) for column in df.columns])
+            # Missing values become blank cells (NaN cannot be written as a number); no copy of the frame is made
+            for row, row_values in enumerate(df.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row, 0, [None if WorkbookWriter._is_missing(value) else value for value in row_values])
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _safe_file_name(key):
+        # Keys such as timestamps contain characters that are not allowed in file names
+        return re.sub(r'[\\/:*?"<>|\s]+', '_', str(key)).strip('_')
+
+    @staticmethod
+    def _is_missing(value):
+        return value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and value != value)
@@ -0,0 +1,112 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LABELS = ["무의견", "만족", "불만족", "의견"]
+KEYWORDS = [("의견", ["주세요", "좋겠습니다", "부탁", "개선", "아쉽"]), ("불만족", ["불편", "불만", "불친절", "오래"]),
+            ("만족", ["좋았", "만족", "감사", "편했"]), ("무의견", ["없", "모르", "-", "."])]
+
+# Answer every "index:content" line of the user message with "index:label"
+# (keyword rules first, then a stable hash of the content, so reruns get the same answers)
+def get_label(content):
+    for label, keywords in KEYWORDS:
+        if any(keyword in content for keyword in keywords):
+            return label
+    return LABELS[zlib.crc32(content.encode()) % len(LABELS)]
+
+class MockChatHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_POST(self):
+        config = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.count("requests")
+
+        time.sleep(max(0.0, config["random"].gauss(config["latency"], config["jitter"])))
+
+        roll = config["random"].random()
+        if roll < config["rate_limit_rate"]:
+            self.server.count("rate_limited")
+            return self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests"}},
+                                   {"Retry-After": str(config["retry_after"])})
+        if roll < config["rate_limit_rate"] + config["error_rate"]:
+            self.server.count("errors")
+            return self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+
+        lines = [line for line in body["messages"][-1]["content"].split("\n") if line.strip()]
+        answers = []
+        for line in lines:
+            idx, _, content = line.partition(":")
+            # Dropped rows exercise the repair rounds
+            if config["random"].random() >= config["drop_rate"]:
+                answers.append(f"{idx}:{get_label(content)}")
+
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 2
+        self._send_json(200, {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "\n".join(answers)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(answers) * 3, "total_tokens": prompt_tokens + len(answers) * 3},
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+class MockChatServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05, jitter=0.01, error_rate=0.0, rate_limit_rate=0.0, drop_rate=0.0, retry_after=1, seed=42):
+        super().__init__(("127.0.0.1", port), MockChatHandler)
+        self.config = {"latency": latency, "jitter": jitter, "error_rate": error_rate, "rate_limit_rate": rate_limit_rate,
+                       "drop_rate": drop_rate, "retry_after": retry_after, "random": random.Random(seed)}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+
+    # Base URL to use as OPENAI_API_BASE
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock chat-completions API that answers 'index:label' per line.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of rows left out of the answers")
+    args = parser.parse_args(argv)
+
+    server = MockChatServer(args.port, args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.drop_rate)
+    print(f"Serving on {server.base_url} (set OPENAI_API_BASE to it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
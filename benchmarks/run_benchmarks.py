@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import pandas as pd
+from survey_generator import write_survey
+from mock_chat_server import MockChatServer
+from GPTHandler import GPTHandler
+from WorkbookWriter import WorkbookWriter
+from ExcelFileAnalyzer import ExcelFileAnalyzer
+
+BENCHMARKS = ("open_excel_file", "get_chunked_tuples", "create_new_column", "combine_two_excel_files",
+              "concatenate_excel_files", "divide_excel_file", "classification")
+GPT_MESSAGE = "create category (of 4 types)"
+
+# Answers the analyzer's file requests like the GUI would
+class BenchmarkObserver:
+
+    def __init__(self):
+        self.excel_file = None
+        self.excel_files = None
+        self.errors = []
+
+    def update(self, event, **kwargs):
+        if event == "request_excel_file":
+            return self.excel_file
+        if event == "request_mutiple_excel_files":
+            return self.excel_files
+        if event == "show_error":
+            self.errors.append(kwargs.get("message"))
+        return None
+
+def get_analyzer(excel_file=None):
+    observer = BenchmarkObserver()
+    observer.excel_file = excel_file
+    analyzer = ExcelFileAnalyzer()
+    analyzer.attach(observer)
+    return analyzer, observer
+
+# Time func over repeat runs (setup is not timed); the code under test prints a lot, which is silenced
+def measure(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings), "max_seconds": max(timings), "repeat": repeat}
+
+def clear_workbook_cache():
+    shutil.rmtree("workbook_cache", ignore_errors=True)
+
+def benchmark_open_excel_file(context, repeat):
+    analyzer, _ = get_analyzer(context["excel_file"])
+    return {
+        "cold": measure(analyzer.open_excel_file, repeat, setup=clear_workbook_cache),
+        "warm": measure(analyzer.open_excel_file, repeat),
+        "streaming_cold": measure(lambda: analyzer.open_excel_file(streaming=True), repeat, setup=clear_workbook_cache),
+    }
+
+def benchmark_get_chunked_tuples(context, repeat):
+    data_structs = list(zip(context["df"]["no"], context["df"]["opinion"]))
+    return {
+        "cold": measure(lambda: GPTHandler.get_chunked_tuples(data_structs, GPT_MESSAGE), repeat, setup=GPTHandler.token_counts.clear),
+        "warm": measure(lambda: GPTHandler.get_chunked_tuples(data_structs, GPT_MESSAGE), repeat),
+        "rows": len(data_structs),
+    }
+
+def benchmark_create_new_column(context, repeat):
+    analyzer, _ = get_analyzer(context["excel_file"])
+    analyzer.open_excel_file()
+    values = dict(zip(context["df"]["no"], context["df"]["category"]))
+    reset = lambda: setattr(analyzer, "df", analyzer.df_original.copy(deep=False))
+    return measure(lambda: analyzer._create_new_column_for_classification(values, "summary"), repeat, setup=reset)
+
+def benchmark_combine_two_excel_files(context, repeat):
+    analyzer, _ = get_analyzer(context["excel_file"])
+    analyzer.open_excel_file()
+    extra_df = analyzer.df_original[["no", "opinion"]].assign(summary=context["df"]["category"].to_numpy())
+    results = {}
+    for output_format in WorkbookWriter.FORMATS:
+        analyzer.output_formats = (output_format,)
+        results[output_format] = measure(lambda: analyzer.combine_two_excel_files(mode='df ready', base_df=analyzer.df_original, extra_df=extra_df), repeat)
+    return results
+
+def benchmark_concatenate_excel_files(context, repeat):
+    analyzer, observer = get_analyzer()
+    observer.excel_files = context["part_files"]
+    return {"cold": measure(analyzer.concatenate_excel_files, repeat, setup=clear_workbook_cache), "files": len(context["part_files"])}
+
+def benchmark_divide_excel_file(context, repeat):
+    analyzer, _ = get_analyzer(context["excel_file"])
+    return {output_format: measure(lambda: analyzer.divide_excel_file(key_column='date', output_format=output_format), repeat)
+            for output_format in ("xlsx", "csv")}
+
+# A whole run against the mock server, with an empty response cache every time
+def benchmark_classification(context, repeat):
+    results = {}
+    for backend in context["backends"]:
+        GPTHandler.configure_backend(backend)
+        runs = iter(range(repeat))
+        setup = lambda: GPTHandler.configure_cache(db_path=os.path.join("cache", f"benchmark_{backend}_{next(runs)}.sqlite3"))
+
+        def classify():
+            analyzer, _ = get_analyzer(context["excel_file"])
+            analyzer.open_excel_file()
+            analyzer.message_resolver("opinion", GPT_MESSAGE, "summary", wait=True)
+
+        requests_before = context["server"].stats["requests"]
+        results[backend] = measure(classify, repeat, setup=setup)
+        results[backend]["requests"] = context["server"].stats["requests"] - requests_before
+    results["retries"] = GPTHandler.get_scheduler().retries
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer end to end on synthetic workbooks and a mock API.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.3)
+    parser.add_argument("--files", type=int, default=4, help="workbooks to concatenate (rows are split among them)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--backends", nargs="+", choices=GPTHandler.BACKENDS, default=list(GPTHandler.BACKENDS))
+    parser.add_argument("--latency", type=float, default=0.05, help="mean latency of the mock API in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--work-dir", default=None, help="where workbooks, caches and outputs go (default: a new temp dir)")
+    parser.add_argument("--output", default=None, help="write the JSON results to this file as well")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="excel_analyzer_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)  # caches, checkpoints and outputs are written relative to the working directory
+
+    # The mock server stands in for the API; the limits are set high so that only its latency counts
+    server = MockChatServer(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                            drop_rate=args.drop_rate).start()
+    os.environ["OPENAI_API_BASE"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    GPTHandler.configure_scheduler(args.max_workers, requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+
+    excel_file = write_survey("survey.xlsx", args.rows, args.duplicate_rate)
+    part_files = [write_survey(f"survey_part{part + 1}.xlsx", max(1, args.rows // args.files), args.duplicate_rate, seed=part)
+                  for part in range(args.files)]
+    context = {"excel_file": excel_file, "df": pd.read_excel(excel_file, engine='openpyxl'), "part_files": part_files,
+               "server": server, "backends": args.backends}
+
+    results = {}
+    for name in args.only:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = globals()[f"benchmark_{name}"](context, args.repeat)
+
+    report = {
+        "benchmark": "end_to_end",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "pandas": pd.__version__,
+                        "cpus": os.cpu_count()},
+        "config": {name: value for name, value in vars(args).items() if name not in ("output",)} | {"work_dir": work_dir},
+        "results": results,
+        "mock_server": dict(server.stats),
+    }
+    server.shutdown()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so every repetition is a cold start (the OS file cache aside)
+# Prints the checkpoints as JSON; the window is skipped when there is no display (e.g. on CI)
+CHILD = r"""
+import sys, json, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+result = {}
+
+import ExcelAnalyzerApp
+result["import_app"] = time.perf_counter() - started
+
+try:
+    app = ExcelAnalyzerApp.ExcelAnalyzerApp()
+    app.app.update()  # draw the window once
+    result["time_to_window"] = time.perf_counter() - started
+    app.app.destroy()
+except Exception as e:  # tkinter.TclError without a display
+    from ExcelFileAnalyzer import ExcelFileAnalyzer
+    ExcelFileAnalyzer()
+    result["time_to_analyzer"] = time.perf_counter() - started
+    result["window_error"] = str(e)
+
+result["heavy_modules_loaded"] = sorted(name for name in ("openai", "tiktoken", "konlpy", "aiohttp", "jpype", "pandas") if name in sys.modules)
+print(json.dumps(result))
+"""
+
+def run_once(work_dir):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD, REPO_DIR], cwd=work_dir, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_total"] = time.perf_counter() - started  # includes the interpreter's own startup
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold start of the app (time-to-window).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--work-dir", default=REPO_DIR, help="directory the app starts in (log files are written there)")
+    parser.add_argument("--output", default=None, help="write the JSON results to this file as well")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.work_dir) for _ in range(args.repeat)]
+    timings = sorted({name for run in runs for name, value in run.items() if isinstance(value, float)})
+    results = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "median_seconds": {name: statistics.median(run[name] for run in runs if name in run) for name in timings},
+        "min_seconds": {name: min(run[name] for run in runs if name in run) for name in timings},
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"],
+        "window_error": runs[-1].get("window_error"),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
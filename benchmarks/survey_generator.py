@@ -0,0 +1,70 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# Building blocks of the free-text answers, per category of "create category (of 4 types)"
+TEMPLATES = {
+    "무의견": ["없음", "없습니다", "특별히 없습니다", "해당 없음", "모르겠습니다", "-", "."],
+    "만족": ["{subject} 정말 좋았습니다", "{subject} 만족합니다", "항상 감사합니다", "{subject} 친절해서 좋았어요",
+            "{subject} 덕분에 편했습니다 감사합니다"],
+    "불만족": ["{subject} 너무 불편했습니다", "{subject} 불만족스럽습니다", "{subject} 때문에 시간이 오래 걸렸어요",
+             "{subject} 응대가 불친절했습니다"],
+    "의견": ["{subject} 개선이 필요합니다. {suggestion}", "{suggestion} {subject} 관련해서 검토 부탁드립니다",
+            "{subject}이(가) 아쉽습니다. {suggestion}", "{suggestion}"],
+}
+SUBJECTS = ["상담 서비스", "홈페이지", "민원 처리", "담당 공무원", "대기 시간", "안내 문자", "주차 시설", "온라인 신청", "전화 연결", "서류 발급"]
+SUGGESTIONS = ["운영 시간을 연장해 주세요", "절차를 간소화해 주세요", "모바일에서도 신청할 수 있으면 좋겠습니다",
+               "안내를 더 자세히 해 주세요", "담당자 연락처를 공개해 주세요", "대기 인원을 미리 알려 주세요",
+               "주말에도 운영해 주세요", "처리 결과를 문자로 알려 주세요"]
+CATEGORY_WEIGHTS = {"무의견": 0.35, "만족": 0.3, "불만족": 0.1, "의견": 0.25}
+START_DATE = "2023-01-01"
+DAYS = 90
+
+# Deterministic survey sheet: no, opinion, category, date (plus a few of the columns real exports carry)
+# duplicate_rate: share of rows whose opinion repeats an earlier row verbatim
+def generate_survey(rows, duplicate_rate=0.3, seed=42):
+    random_state = np.random.RandomState(seed)
+    categories = random_state.choice(list(CATEGORY_WEIGHTS), size=rows, p=list(CATEGORY_WEIGHTS.values()))
+
+    opinions = []
+    for row, category in enumerate(categories):
+        if row > 0 and random_state.rand() < duplicate_rate:
+            source = random_state.randint(row)
+            opinions.append(opinions[source])
+            categories[row] = categories[source]
+            continue
+        template = TEMPLATES[category][random_state.randint(len(TEMPLATES[category]))]
+        opinion = template.format(subject=SUBJECTS[random_state.randint(len(SUBJECTS))],
+                                  suggestion=SUGGESTIONS[random_state.randint(len(SUGGESTIONS))])
+        # A respondent number keeps generated answers distinct unless they are meant to be duplicates
+        opinions.append(opinion if category == "무의견" else f"{opinion} ({row % 997})")
+
+    dates = pd.Timestamp(START_DATE) + pd.to_timedelta(random_state.randint(DAYS, size=rows), unit="D")
+    return pd.DataFrame({
+        "no": np.arange(1, rows + 1),
+        "opinion": opinions,
+        "category": categories,
+        "date": dates.strftime("%Y-%m-%d"),
+        "age": random_state.choice(["20대", "30대", "40대", "50대", "60대 이상"], size=rows),
+        "field": random_state.choice(SUBJECTS, size=rows),
+    })
+
+def write_survey(file_name, rows, duplicate_rate=0.3, seed=42):
+    generate_survey(rows, duplicate_rate, seed).to_excel(file_name, index=False, engine='openpyxl')
+    return file_name
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic Korean survey workbook.")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    write_survey(args.output, args.rows, args.duplicate_rate, args.seed)
+    print(f"Wrote {args.rows} rows to {os.path.abspath(args.output)}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,12 @@
 import functools
-from numpy import hstack
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import MinMaxScaler
+from ClusteringEngine import ClusteringEngine
 from ExcelFileAnalyzer import ExcelFileAnalyzer
 
 
 def tokenize_data(self, data):
     try:
-        tokens = self.okt.morphs(data)
+        tokens = self.get_morph_analyzer().morphs_many([data])[0]
         return ' '.join(tokens)
     except Exception as e:
         print(f"Error tokenizing data: {e}")
@@ -25,9 +23,9 @@ def run_clustering(self, target_column):
     # Tokenizing values in each row of the target column
     self._tokenize_column(target_column)
 
-    # Vectorize the data (normalized length included)
-    tfidf_matrix = self._vectorize_data(self.df[f'tokenized_{target_column}'])
-    combined_features = self._add_normalized_length(target_column, tfidf_matrix)
+    # Vectorize the data once (sparse TF-IDF); every pass below selects its rows from the same matrix
+    self.clustering_engine = ClusteringEngine(random_state=ExcelFileAnalyzer.SEED).fit(self.df[f'tokenized_{target_column}'])
+    combined_features = self._add_normalized_length(target_column)
 
     # Repeat the same process until the clustering result is stable
 
@@ -38,8 +36,7 @@ def run_clustering(self, target_column):
     self._drop_data_by_cluster('binary_cluster', opinion_cluster)
 
     # 2. 'Satisfied/Not Satisfied' and 'Opinion'
-    tfidf_matrix = self._vectorize_data(self.df[f'tokenized_{target_column}'])
-    combined_features = self._add_normalized_length(target_column, tfidf_matrix)
+    combined_features = self._add_normalized_length(target_column)
     self.df['binary_cluster'] = self._apply_binary_clustering(combined_features)
     avg_length_per_cluster = self.df.groupby('binary_cluster')['text_length'].mean()
     opinion_cluster = avg_length_per_cluster.idxmax()
@@ -75,21 +72,20 @@ def log_function_call(func):
 # Methods called inside run_clustering()
 @log_function_call
 def _tokenize_column(self, target_column):
-    self.df[f'tokenized_{target_column}'] = self.df[target_column].apply(self.tokenize_data)
-
-from sklearn.feature_extraction.text import TfidfVectorizer
+    # Batched, memoized and (for large sheets) parallel instead of one JVM call per row
+    morphs = self.get_morph_analyzer().morphs_many(self.df[target_column].astype(str).tolist())
+    self.df[f'tokenized_{target_column}'] = [' '.join(tokens) for tokens in morphs]
 
 @log_function_call
-def _add_normalized_length(self, target_column, tfidf_matrix):
-    self.df['text_length'] = self.df[target_column].apply(len)
-    scaler = MinMaxScaler()
-    normalized_lengths = scaler.fit_transform(self.df['text_length'].values.reshape(-1, 1))
-    return hstack([tfidf_matrix, normalized_lengths])
+def _add_normalized_length(self, target_column):
+    self.df['text_length'] = self.df[target_column].str.len()
+    # Sparse TF-IDF rows of the remaining data with the min-max scaled length appended (nothing is densified)
+    return self.clustering_engine.get_features(self.df['text_length'])
 
 @log_function_call
 def _apply_binary_clustering(self, combined_features):
-    binary_kmeans = KMeans(n_clusters=2, n_init=10, random_state=ExcelFileAnalyzer.SEED)
-    return binary_kmeans.fit_predict(combined_features)
+    # KMeans, or MiniBatchKMeans for large inputs
+    return self.clustering_engine.cluster(combined_features, n_clusters=2)
 
 @log_function_call
 def _drop_data_by_cluster(self, target_to_measure, standard_clustor):
@@ -0,0 +1,109 @@
+import threading
+import pytest
+import GPTHandler as gpt_handler_module
+from GPTHandler import GPTHandler
+from ResponseCache import ResponseCache
+
+GPT_MESSAGE = "create category (of 4 types)"
+
+# One token per character, so the tests do not need tiktoken's encoding files
+class CharacterEncoding:
+    def encode(self, content):
+        return list(content)
+
+    def encode_batch(self, contents, num_threads=1):
+        return [list(content) for content in contents]
+
+@pytest.fixture(autouse=True)
+def offline_handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(GPTHandler, "encoding", CharacterEncoding())
+    monkeypatch.setattr(GPTHandler, "token_counts", {})
+    monkeypatch.setattr(GPTHandler, "response_cache", ResponseCache(str(tmp_path / "responses.sqlite3")))
+    monkeypatch.setattr(GPTHandler, "backend", "thread")
+
+# Stands in for the API: answer(idx, content, call) returns the value of one row, or None to leave it out
+class FakeChat:
+    def __init__(self, answer=None, fail=None):
+        self.answer = answer or (lambda idx, content, call: f"V{idx}")
+        self.fail = fail or (lambda call: False)
+        self.chunks = []
+        self.lock = threading.Lock()
+
+    def __call__(self, chunk, gpt_message, on_request=None):
+        with self.lock:
+            self.chunks.append(chunk)
+            call = len(self.chunks)
+        if self.fail(call):
+            raise ValueError("server error")
+        values = {idx: self.answer(idx, content, call) for idx, content in GPTHandler._split_chunk(chunk).items()}
+        return "\n".join(f"{idx}:{value}" for idx, value in values.items() if value is not None)
+
+def run(monkeypatch, chat, rows):
+    monkeypatch.setattr(GPTHandler, "_GPTHandler__get_response_from_chatgpt", chat)
+    chunks = GPTHandler.get_chunked_tuples(rows, GPT_MESSAGE)
+    return GPTHandler.start_threaded_get_response("survey.xlsx", chunks, GPT_MESSAGE)
+
+CHUNK = "1:좋아요\n2:불편해요\n3:없음\n4:보통"
+
+def test_validate_response_accepts_every_row():
+    accepted, repairs = GPTHandler.validate_response(CHUNK, "1:만족\n2:불만족\n3, 4:무의견")
+    assert accepted == {1: "만족", 2: "불만족", 3: "무의견", 4: "무의견"}
+    assert repairs == {}
+
+def test_validate_response_rejects_ranges():
+    # "1-3" does not say which value belongs to which row
+    accepted, repairs = GPTHandler.validate_response(CHUNK, "1-3:만족\n4:무의견")
+    assert accepted == {4: "무의견"}
+    assert repairs == {1: "좋아요", 2: "불편해요", 3: "없음"}
+
+def test_validate_response_rejects_conflicting_duplicates():
+    accepted, repairs = GPTHandler.validate_response(CHUNK, "1:만족\n1:불만족\n2:불만족\n2:불만족\n3:무의견\n4:무의견")
+    assert accepted == {2: "불만족", 3: "무의견", 4: "무의견"}
+    assert repairs == {1: "좋아요"}
+
+def test_validate_response_repairs_missing_and_malformed_rows():
+    accepted, repairs = GPTHandler.validate_response(CHUNK, "1:만족\n그리고\nx:무의견\n9:만족\n4:무의견")
+    assert accepted == {1: "만족", 4: "무의견"}
+    assert repairs == {2: "불편해요", 3: "없음"}
+
+def test_missing_rows_are_asked_again(monkeypatch):
+    rows = [(idx, f"의견 {idx}") for idx in range(1, 31)]
+    # The first response leaves out every third row
+    chat = FakeChat(answer=lambda idx, content, call: None if call == 1 and idx % 3 == 0 else f"V{idx}")
+    results, unresolved = run(monkeypatch, chat, rows)
+
+    assert results == {idx: f"V{idx}" for idx in range(1, 31)}
+    assert unresolved == {}
+    # Only the ten missing rows are re-sent, in chunks of at most REPAIR_CHUNK_ROWS
+    assert len(chat.chunks) == 2
+    assert sorted(GPTHandler._split_chunk(chat.chunks[1])) == list(range(3, 31, 3))
+
+def test_failed_chunks_are_repaired(monkeypatch):
+    rows = [(idx, f"의견 {idx}") for idx in range(1, 11)]
+    chat = FakeChat(fail=lambda call: call == 1)
+    results, unresolved = run(monkeypatch, chat, rows)
+
+    assert results == {idx: f"V{idx}" for idx in range(1, 11)}
+    assert unresolved == {}
+
+def test_rows_left_after_the_repair_rounds_are_unresolved(monkeypatch):
+    rows = [(idx, f"의견 {idx}") for idx in range(1, 6)]
+    chat = FakeChat(fail=lambda call: True)
+    results, unresolved = run(monkeypatch, chat, rows)
+
+    assert results == {}
+    assert unresolved == {idx: f"의견 {idx}" for idx in range(1, 6)}
+    assert len(chat.chunks) == 1 + gpt_handler_module.MAX_REPAIR_ROUNDS
+
+def test_repair_chunks_are_capped_by_the_budget(monkeypatch):
+    monkeypatch.setattr(gpt_handler_module, "MAX_REPAIR_CHUNKS", 1)
+    monkeypatch.setattr(gpt_handler_module, "REPAIR_CHUNK_ROWS", 2)
+    rows = [(idx, f"의견 {idx}") for idx in range(1, 6)]
+    # Only the first request is answered, and only for row 1
+    chat = FakeChat(answer=lambda idx, content, call: f"V{idx}" if call == 1 and idx == 1 else None)
+    results, unresolved = run(monkeypatch, chat, rows)
+
+    assert results == {1: "V1"}
+    assert unresolved == {idx: f"의견 {idx}" for idx in range(2, 6)}
+    # One full chunk, then a single repair chunk: the other two are over the budget
+    assert len(chat.chunks) == 2
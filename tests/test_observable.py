@@ -0,0 +1,55 @@
+import threading
+from Observable import Observable
+
+class RecordingObserver:
+    def __init__(self):
+        self.events = []
+
+    def update(self, event, **kwargs):
+        self.events.append((event, kwargs))
+
+def make_observable():
+    observable, observer = Observable(), RecordingObserver()
+    observable.attach(observer)
+    return observable, observer
+
+def test_post_does_not_notify_until_drained():
+    observable, observer = make_observable()
+    observable.post("set_processed_chunks", processed_chunks=1)
+    assert observer.events == []
+    assert observable.drain() == 1
+    assert observer.events == [("set_processed_chunks", {"processed_chunks": 1})]
+    assert observable.drain() == 0
+
+def test_progress_events_are_coalesced_to_the_latest():
+    observable, observer = make_observable()
+    observable.post("set_num_chunks", num_chunks=10)
+    for processed_chunks in range(1, 6):
+        observable.post("set_processed_chunks", processed_chunks=processed_chunks)
+    observable.post("set_num_chunks", num_chunks=12)
+
+    assert observable.drain() == 2
+    # A replaced event moves to the position of its latest post
+    assert observer.events == [("set_processed_chunks", {"processed_chunks": 5}), ("set_num_chunks", {"num_chunks": 12})]
+
+def test_uncoalesced_events_are_all_delivered_in_order():
+    observable, observer = make_observable()
+    observable.post("show_error", coalesce=False, message="first")
+    observable.post("set_processed_chunks", processed_chunks=1)
+    observable.post("show_error", coalesce=False, message="second")
+
+    assert observable.drain() == 3
+    assert observer.events == [("show_error", {"message": "first"}), ("set_processed_chunks", {"processed_chunks": 1}),
+                               ("show_error", {"message": "second"})]
+
+def test_posts_from_many_threads():
+    observable, observer = make_observable()
+    threads = [threading.Thread(target=lambda idx=idx: [observable.post("show_error", coalesce=False, message=f"{idx}:{n}") for n in range(100)])
+               for idx in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert observable.drain() == 400
+    assert len({kwargs["message"] for _, kwargs in observer.events}) == 400
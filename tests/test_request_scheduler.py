@@ -0,0 +1,96 @@
+import json
+import urllib.request
+import urllib.error
+import pytest
+from RequestScheduler import RequestScheduler, TokenBucket
+from AsyncChatClient import AsyncChatClient, ChatCompletionError
+from benchmarks.mock_chat_server import MockChatServer
+
+MODEL = "gpt-3.5-turbo"
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(RequestScheduler, "BASE_DELAY", 0.01)
+    monkeypatch.setattr(RequestScheduler, "MAX_DELAY", 0.05)
+
+# Half of the requests are rate limited: enough that every test sees 429s. At that rate eight retries
+# still run out for about one request in 500, so the tests that talk to the server allow more
+MAX_RETRIES = 20
+
+@pytest.fixture
+def server():
+    server = MockChatServer(latency=0.0, jitter=0.0, rate_limit_rate=0.5, retry_after=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get_messages(rows):
+    return [{"role": "system", "content": "classify"}, {"role": "user", "content": "\n".join(f"{idx}:{text}" for idx, text in rows)}]
+
+# The thread backend's request, reduced to the standard library
+def post_chat(url, messages):
+    request = urllib.request.Request(url, data=json.dumps({"model": MODEL, "messages": messages}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())["choices"][0]["message"]["content"]
+    except urllib.error.HTTPError as e:
+        raise ChatCompletionError(e.code, e.read().decode(), dict(e.headers))
+
+def test_token_bucket_delays_requests_over_the_limit():
+    bucket = TokenBucket(60)  # one per second
+    assert bucket.reserve(60) == 0.0
+    assert 0.9 < bucket.reserve(1) <= 1.0
+    assert 1.9 < bucket.reserve(1) <= 2.0  # later callers queue up behind earlier ones
+
+def test_token_bucket_is_drained_by_a_429():
+    scheduler = RequestScheduler(max_workers=1, requests_per_minute=600, tokens_per_minute=6000)
+    delay = scheduler.get_retry_delay(ChatCompletionError(429, "rate limited", {"Retry-After": "0"}), 0)
+    assert delay <= RequestScheduler.MAX_DELAY
+    assert scheduler.get_acquire_delay(1) > 0
+    assert scheduler.retries == 1
+    scheduler.shutdown()
+
+def test_call_retries_429_and_gives_up_on_other_errors():
+    scheduler = RequestScheduler(max_workers=1, max_retries=3)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ChatCompletionError(429, "rate limited", {"Retry-After": "0"})
+        return "ok"
+
+    assert scheduler.call(flaky, 1) == "ok"
+    assert len(attempts) == 3 and scheduler.retries == 2
+
+    def bad_request():
+        raise ChatCompletionError(400, "bad request")
+
+    with pytest.raises(ChatCompletionError):
+        scheduler.call(bad_request, 1)
+    assert scheduler.retries == 2
+    scheduler.shutdown()
+
+def test_thread_backend_retries_429_from_the_mock_server(server):
+    scheduler = RequestScheduler(max_workers=4, max_retries=MAX_RETRIES)
+    url = f"{server.base_url}/chat/completions"
+    futures = [scheduler.submit(scheduler.call, post_chat, 10, url, get_messages([(idx, "없습니다")])) for idx in range(20)]
+    assert [future.result() for future in futures] == [f"{idx}:무의견" for idx in range(20)]
+    assert server.stats["rate_limited"] > 0
+    assert scheduler.retries == server.stats["rate_limited"]
+    scheduler.shutdown()
+
+def test_async_client_retries_429_from_the_mock_server(server):
+    scheduler = RequestScheduler(max_retries=MAX_RETRIES)
+    client = AsyncChatClient("mock", server.base_url, MODEL, scheduler, concurrency=8)
+    responses, errors = {}, {}
+    jobs = [(idx, get_messages([(idx, "정말 좋았습니다")]), 10) for idx in range(20)]
+
+    client.get_responses(jobs, responses.__setitem__, errors.__setitem__)
+
+    assert errors == {}
+    assert responses == {idx: f"{idx}:만족" for idx in range(20)}
+    assert server.stats["rate_limited"] > 0
+    assert scheduler.retries == server.stats["rate_limited"]
+    scheduler.shutdown()
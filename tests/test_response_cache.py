@@ -0,0 +1,63 @@
+import types
+import pytest
+import ResponseCache as response_cache_module
+from ResponseCache import ResponseCache
+
+MODEL = "gpt-3.5-turbo"
+PROMPT = "classify"
+
+@pytest.fixture
+def clock(monkeypatch):
+    # last_access comes from time.time(); a fake clock orders the flushes deterministically
+    clock = types.SimpleNamespace(now=0.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(response_cache_module, "time", clock)
+    return clock
+
+def make_entry(content, value="만족"):
+    return {"model": MODEL, "prompt_hash": ResponseCache.get_prompt_hash(PROMPT), "gpt_message": "create category (of 4 types)",
+            "content": content, "value": value}
+
+def put(cache, clock, content, value="만족"):
+    clock.now += 1
+    key = ResponseCache.get_key(MODEL, PROMPT, content)
+    cache.put_many({key: make_entry(content, value)})
+    cache.flush()
+    return key
+
+def stored_size(cache):
+    return cache._get_connection().execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+def test_size_follows_inserts_and_replacements(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    put(cache, clock, "a")
+    put(cache, clock, "b")
+    assert cache.size == stored_size(cache) > 0
+
+    # A replaced row counts once, with its new size
+    put(cache, clock, "a", value="불만족이 아주 많습니다")
+    assert cache.size == stored_size(cache)
+    assert cache.get_stats()["entries"] == 2
+
+    # A reopened cache sums the stored rows on its first flush
+    reopened = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    put(reopened, clock, "c")
+    assert reopened.size == stored_size(reopened)
+
+def test_least_recently_used_rows_are_evicted(tmp_path, clock):
+    row_size = ResponseCache._get_size(ResponseCache.get_key(MODEL, PROMPT, "a"), make_entry("a"))
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=4 * row_size)
+    keys = {content: put(cache, clock, content) for content in "abcd"}
+    assert cache.evictions == 0
+
+    # Reading "a" makes it the most recently used row
+    clock.now += 1
+    assert list(cache.get_many([keys["a"]])) == [keys["a"]]
+    cache.flush()
+
+    # Over the cap: evicted down to EVICTION_TARGET of it, oldest first
+    keys["e"] = put(cache, clock, "e")
+    remaining = cache.get_many(keys.values())
+    assert sorted(entry["content"] for entry in remaining.values()) == ["a", "d", "e"]
+    assert cache.evictions == 2
+    assert cache.size == stored_size(cache) <= 4 * row_size
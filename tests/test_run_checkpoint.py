@@ -0,0 +1,66 @@
+import json
+import pytest
+from RunCheckpoint import RunCheckpoint
+
+PROMPT = "create category (of 4 types)"
+
+@pytest.fixture
+def excel_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "survey.xlsx"
+    path.write_bytes(b"not really a workbook, only fingerprinted")
+    return str(path)
+
+def open_checkpoint(excel_file):
+    return RunCheckpoint(excel_file, PROMPT, "opinion", None, "summary")
+
+def read_status(checkpoint):
+    with open(checkpoint.manifest_path, encoding='utf-8') as f:
+        return json.load(f)["status"]
+
+def test_interrupted_run_is_resumed(excel_file):
+    checkpoint = open_checkpoint(excel_file)
+    checkpoint.record({1: "A", 2: "B"})
+    checkpoint.record({3: "C"})
+    # No complete(): the process died mid-run
+    checkpoint.rows_file.close()
+
+    resumed = open_checkpoint(excel_file)
+    assert resumed.run_id == checkpoint.run_id
+    assert resumed.get_values() == {1: "A", 2: "B", 3: "C"}
+    assert resumed.is_done(2) and not resumed.is_done(4)
+
+def test_truncated_last_line_is_ignored(excel_file):
+    checkpoint = open_checkpoint(excel_file)
+    checkpoint.record({1: "A"})
+    checkpoint.rows_file.write('[[2, "B"')
+    checkpoint.rows_file.close()
+
+    assert open_checkpoint(excel_file).get_values() == {1: "A"}
+
+def test_complete_run_starts_over(excel_file):
+    checkpoint = open_checkpoint(excel_file)
+    checkpoint.record({1: "A"})
+    checkpoint.complete()
+    assert read_status(checkpoint) == "complete"
+
+    restarted = open_checkpoint(excel_file)
+    assert restarted.get_values() == {}
+    assert read_status(restarted) == "running"
+
+def test_run_with_unresolved_rows_is_resumed(excel_file):
+    checkpoint = open_checkpoint(excel_file)
+    checkpoint.record({1: "A"})
+    checkpoint.complete(unresolved_rows=2)
+    assert read_status(checkpoint) == "incomplete"
+
+    assert open_checkpoint(excel_file).get_values() == {1: "A"}
+
+def test_other_prompt_is_another_run(excel_file):
+    checkpoint = open_checkpoint(excel_file)
+    checkpoint.record({1: "A"})
+    checkpoint.rows_file.close()
+
+    other = RunCheckpoint(excel_file, "evaluate category", "opinion", None, "summary")
+    assert other.run_id != checkpoint.run_id
+    assert other.get_values() == {}
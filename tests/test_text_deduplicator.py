@@ -0,0 +1,37 @@
+import pytest
+from TextDeduplicator import TextDeduplicator
+
+NEGATION_PAIRS = [
+    ("만족", "불만족"),
+    ("좋아요", "안좋아요"),
+    ("상담 서비스가 좋았습니다", "상담 서비스가 안 좋았습니다"),
+    ("안내 문자를 받았습니다", "안내 문자를 못 받았습니다"),
+    ("불편한 점이 있습니다", "불편한 점이 없습니다"),
+    ("대기 시간이 길었습니다", "대기 시간이 길지 않았습니다"),
+]
+
+@pytest.mark.parametrize("text, other_text", NEGATION_PAIRS)
+@pytest.mark.parametrize("threshold", [None, 0.5])
+def test_negation_pairs_stay_apart(text, other_text, threshold):
+    representatives, groups = TextDeduplicator.cluster_near_duplicates([(1, text), (2, other_text)], threshold)
+    assert len(representatives) == 2
+    assert groups == {1: [1], 2: [2]}
+
+def test_near_duplicates_are_clustered():
+    data_structs = [(1, "홈페이지에서 온라인 신청을 할 수 있게 해 주세요 감사합니다"),
+                    (2, "홈페이지에서 온라인 신청을 할 수 있게 해 주세요 감사합니다!!"),
+                    (3, "홈페이지에서 온라인 신청을 할수 있게 해주세요 감사합니다요"),
+                    (4, "주차 시설이 부족합니다")]
+    representatives, groups = TextDeduplicator.cluster_near_duplicates(data_structs)
+    assert [data_tuple[0] for data_tuple in representatives] == [1, 4]
+    assert groups == {1: [1, 2, 3], 4: [4]}
+
+def test_standard_values_are_not_mixed():
+    data_structs = [(1, "운영 시간을 연장해 주세요", "의견"), (2, "운영 시간을 연장해 주세요", "불만족")]
+    representatives, _ = TextDeduplicator.cluster_near_duplicates(data_structs)
+    assert len(representatives) == 2
+
+def test_collapse_and_expand():
+    representatives, groups = TextDeduplicator.collapse([(1, "없음"), (2, " 없음."), (3, "만족")])
+    assert representatives == [(1, "없음"), (3, "만족")]
+    assert TextDeduplicator.expand({1: "무의견", 3: "만족"}, groups) == {1: "무의견", 2: "무의견", 3: "만족"}
@@ -0,0 +1,47 @@
+import pandas as pd
+from openpyxl import Workbook
+from WorkbookLoader import WorkbookLoader
+
+def write_workbook(path, rows):
+    workbook = Workbook()
+    worksheet = workbook.active
+    for row in rows:
+        worksheet.append(row)
+    # A formatted but unused cell below the data, as spreadsheets often have
+    worksheet.cell(row=len(rows) + 5, column=1).number_format = '0.00'
+    workbook.save(path)
+    return str(path)
+
+# Missing values as None and numbers as objects, so that the readers' dtype choices do not matter
+def as_objects(df):
+    return df.astype(object).where(df.notna(), None)
+
+def test_streaming_keeps_blank_rows_like_read_excel(tmp_path):
+    excel_file = write_workbook(tmp_path / "blank_rows.xlsx",
+                                [["no", "opinion"], [1, "a"], [None, None], [3, "c"], [None, None], [None, None], [6, None]])
+    expected = pd.read_excel(excel_file, engine='openpyxl')
+    for batch_size in (None, 2):
+        df = WorkbookLoader.read_excel(excel_file, streaming=True, batch_size=batch_size, use_cache=False)
+        pd.testing.assert_frame_equal(as_objects(df), as_objects(expected))
+
+def test_streaming_projects_columns(tmp_path):
+    excel_file = write_workbook(tmp_path / "wide.xlsx", [["no", "phone", "opinion"], [1, "010", "a"], [None, None, None], [3, "011", "c"]])
+    df = WorkbookLoader.read_excel(excel_file, columns=["no", "opinion"], streaming=True, use_cache=False)
+    assert list(df.columns) == ["no", "opinion"]
+    assert len(df) == 3
+
+def test_column_names_match_with_and_without_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    excel_file = write_workbook(tmp_path / "numbered.xlsx", [["no", 2023, 2024], [1, "a", "b"], [2, "c", "d"]])
+    cold = WorkbookLoader.read_excel(excel_file)
+    warm = WorkbookLoader.read_excel(excel_file)
+    assert list(cold.columns) == list(warm.columns) == ["no", "2023", "2024"]
+
+def test_columns_come_in_the_requested_order_on_every_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    excel_file = write_workbook(tmp_path / "ordered.xlsx", [["no", "phone", "opinion"], [1, "010", "a"], [2, "011", "b"]])
+    columns = ["opinion", "no"]
+    cold = WorkbookLoader.read_excel(excel_file, columns=columns)
+    warm = WorkbookLoader.read_excel(excel_file, columns=columns)
+    streamed = WorkbookLoader.read_excel(excel_file, columns=columns, streaming=True, use_cache=False)
+    assert list(cold.columns) == list(warm.columns) == list(streamed.columns) == columns